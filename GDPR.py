@@ -1,239 +1,98 @@
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from plotly.colors import qualitative
 import os
-
-# ════════════════════════════════════════════════
-# PALETTE
-# ════════════════════════════════════════════════
-palette = {
-    "remarketing":          "#636EFA",
-    "third party":          "#EF5538",
-    "datacap":              "#00CC96",
-    "Customer":             "#1f77b4",
-    "Remarketing Dealer":   "#ff7f0e",
-    "Legal Representative": "#2ca02c",
-    "Shareholder":          "#d62728",
-    "Guarantor":            "#9467bd",
-    "Unknown":              "#8c564b",
-    "Supplier":             "#e377c2",
-    "Parent":               "#7f7f7f",
-    "CUS_CORPORATE":        "#bcbd22",
-    "CUS_PRIVATE":          "#17becf",
-}
-
-all_s2 = (df_result.select("source_type2_viz").distinct()
-          .rdd.flatMap(lambda x: x).collect())
-extra_colors = qualitative.Plotly * ((len(all_s2) // len(qualitative.Plotly)) + 1)
-for i, s2 in enumerate(all_s2):
-    if s2 and s2 not in palette:
-        palette[s2] = extra_colors[i]
-
-# ════════════════════════════════════════════════
-# BRANCH + TYPE VALUES
-# ════════════════════════════════════════════════
-branch_vals = sorted([b for b in df_result.select("BRANCH").distinct()
-                      .rdd.flatMap(lambda x: x).collect() if b])
+import pandas as pd
+from forces import (extend_palette, dims_from_frame, cube_from_fine, build_axes, combo_xy,
+                    combo_title, make_combo_buttons, build_figure, write_html_dedup,
+                    write_html_sharded, write_html_offline)
+from forces_backend import SparkBackend, LocalBackend
+from forces_cache import (CACHE_DIR, INCR_DIR, LOOKBACK_DAYS,
+                          load_or_compute, load_incremental)
+from forces_trace import Tracer
+from forces_delta import DELTA_DIR, load_deltas
+from forces_anomaly import pack_series, analyze, flagged, heatmap_figure
+
+# ════════════════════════════════════════════════
+# BACKEND — Spark (df_result) o exports locales Parquet/CSV
+# ════════════════════════════════════════════════
+LOCAL_SOURCE = None   # p.ej. "/dbfs/exports/forces/" para ejecutar sin Spark
+
+backend = LocalBackend(LOCAL_SOURCE) if LOCAL_SOURCE else SparkBackend(df_result)
+
+# ── instrumentación por etapas (tiempos, filas al driver, jobs de Spark) ──
+TRACE      = True
+TRACE_PATH = "/Workspace/Users/TU_EMAIL@dominio.com/forces_trace.json"
+
+tracer = Tracer(enabled=TRACE,
+                spark=backend.data.sparkSession if backend.name == "spark" else None)
+
+# ════════════════════════════════════════════════
+# AGREGADO ÚNICO (cube branch x type x date x source_type x s2)
+# ════════════════════════════════════════════════
+CUBE_PATH     = "/Workspace/Users/TU_EMAIL@dominio.com/forces_cube.parquet"
+USE_CACHE     = True   # reutiliza el agregado diario si la entrada no ha cambiado
+TABLE_VERSION = None   # versión Delta de la tabla origen, si se conoce
+INCREMENTAL   = False  # solo agrega los días nuevos (hwm - LOOKBACK_DAYS en adelante)
+SHOW_DELTAS   = False  # añade new/removed/changed (forces_delta) como source_type extra
+
+print(f"⏳ Agregando (cube, backend {backend.name})...")
+with tracer.stage("aggregate") as st:
+    if INCREMENTAL:
+        fine_pdf = load_incremental(backend, INCR_DIR, LOOKBACK_DAYS)
+        cube_pdf = cube_from_fine(fine_pdf)
+    elif USE_CACHE:
+        fine_pdf = load_or_compute(backend, CACHE_DIR, TABLE_VERSION)
+        cube_pdf = cube_from_fine(fine_pdf)
+    else:
+        cube_pdf = backend.get_cube()
+    if SHOW_DELTAS:
+        delta_pdf = load_deltas(DELTA_DIR)
+        if len(delta_pdf):
+            # source_type disjuntos: el cube de la unión es la concatenación
+            cube_pdf = pd.concat([cube_pdf, cube_from_fine(delta_pdf)], ignore_index=True)
+            print(f"➕ Deltas: {len(delta_pdf)} filas como source_type extra")
+    st.collected(cube_pdf)
+# copia local del agregado para el modo interactivo (forces_server.py)
+os.makedirs(os.path.dirname(CUBE_PATH), exist_ok=True)
+cube_pdf.to_parquet(CUBE_PATH, index=False)
+
+# ════════════════════════════════════════════════
+# DIMENSIONES — BRANCH + TYPE VALUES + PALETTE
+# ════════════════════════════════════════════════
+# Con el agregado diario ya en el driver (caché o incremental, ya fusionado)
+# salen de ahí; sin él, un solo job sobre la entrada.
+with tracer.stage("discover") as st:
+    if INCREMENTAL or USE_CACHE:
+        dims, dims_card = dims_from_frame(fine_pdf)
+    else:
+        dims, dims_card = backend.discover_dims()
+    st.collected(rows=sum(len(v) for v in dims.values()))
+palette = extend_palette(dims["source_type2_viz"])
+
+branch_vals  = dims["BRANCH"]
 all_branches = ["All"] + branch_vals
 
-type_vals   = sorted([t for t in df_result.select("type_col").distinct()
-                      .rdd.flatMap(lambda x: x).collect() if t])
+type_vals   = dims["type_col"]
 all_types   = ["All"] + type_vals
 
 # ════════════════════════════════════════════════
-# HELPERS
+# PRECOMPUTA BASE (All x All) — eje de fechas común
 # ════════════════════════════════════════════════
-def filter_df(branch, type_col):
-    data = df_result
-    if branch   != "All": data = data.filter(F.col("BRANCH")   == branch)
-    if type_col != "All": data = data.filter(F.col("type_col") == type_col)
-    return data
-
-def get_pdf_type(data):
-    pdf = (data.groupBy("date", "source_type")
-               .agg(F.sum("count").alias("cnt"))
-               .toPandas())
-    pdf["date"] = pd.to_datetime(pdf["date"]).dt.normalize()
-    pdf = (pdf.pivot(index="date", columns="source_type", values="cnt")
-              .fillna(0).reset_index()
-              .sort_values("date"))
-    for col in ["remarketing", "third party", "datacap"]:
-        if col not in pdf.columns:
-            pdf[col] = 0
-    pdf["date"] = pdf["date"].dt.strftime("%Y-%m-%d")
-    return pdf
-
-def get_pdf_s2(data):
-    pdf = (data.groupBy("date", "source_type", "source_type2_viz")
-               .agg(F.sum("count").alias("cnt"))
-               .toPandas())
-    pdf["date"] = pd.to_datetime(pdf["date"]).dt.normalize()
-    pdf = pdf[pdf["source_type2_viz"].notna()]
-    pdf["date"] = pdf["date"].dt.strftime("%Y-%m-%d")
-    pdf = pdf.sort_values("date").reset_index(drop=True)
-    return pdf
-
-def get_y_s2(pdf, src, sg, date_vals):
-    sub = pdf[
-        (pdf["source_type"] == src) &
-        (pdf["source_type2_viz"] == sg)
-    ][["date", "cnt"]].copy()
-    sub = sub.groupby("date")["cnt"].sum()
-    return [int(sub.get(d, 0)) for d in date_vals]
-
-# ════════════════════════════════════════════════
-# PRECOMPUTA BASE (All x All)
-# ════════════════════════════════════════════════
-pdf_type_all  = get_pdf_type(df_result)
-pdf_s2_all    = get_pdf_s2(df_result)
-x_dates_all   = pdf_type_all["date"].tolist()
-date_vals_all = sorted(pdf_s2_all["date"].unique().tolist())
-
-g2_structure = []
-for src in ["remarketing", "third party", "datacap"]:
-    subs = (pdf_s2_all[pdf_s2_all["source_type"] == src]["source_type2_viz"]
-            .dropna().unique().tolist())
-    for sg in subs:
-        g2_structure.append((src, sg))
+axes         = build_axes(cube_pdf)
+x_dates      = axes["x_dates"]
+g2_structure = axes["g2_structure"]
 
 # ════════════════════════════════════════════════
 # PRECALCULA TODAS LAS COMBINACIONES branch x type
+# (slices locales del cube, sin más jobs de Spark)
 # ════════════════════════════════════════════════
 print("⏳ Precalculando combinaciones...")
-combo_data = {}
-for branch in all_branches:
-    for type_col in all_types:
-        df_b   = filter_df(branch, type_col)
-        pdf_b1 = get_pdf_type(df_b)
-        pdf_b2 = get_pdf_s2(df_b)
-        x1     = pdf_b1["date"].tolist()
-        dvals  = sorted(pdf_b2["date"].unique().tolist())
-
-        new_x, new_y = [], []
-        for col in ["remarketing", "third party", "datacap"]:
-            new_x.append(x1); new_y.append(pdf_b1[col].tolist())
-        for col in ["remarketing", "third party", "datacap"]:
-            new_x.append(x1); new_y.append(pdf_b1[col].tolist())
-        for src, sg in g2_structure:
-            y = get_y_s2(pdf_b2, src, sg, dvals)
-            new_x.append(dvals); new_y.append(y)
-            new_x.append(dvals); new_y.append(y)
-
-        combo_data[(branch, type_col)] = (new_x, new_y)
-        print(f"  ✅ {branch} x {type_col}")
-
-print("✅ Todas las combinaciones calculadas")
-
-# ════════════════════════════════════════════════
-# FIGURA
-# ════════════════════════════════════════════════
-fig = make_subplots(
-    rows=2, cols=1,
-    subplot_titles=("Counts by Date – summed per source_type",
-                    "Counts by Date – summed per source_type2_viz"),
-    vertical_spacing=0.18,
-    shared_xaxes=True,
-)
-
-# ── GRAPH 1: lines ──
-for col, color in [("remarketing","#636EFA"),
-                   ("third party","#EF5538"),
-                   ("datacap","#00CC96")]:
-    fig.add_trace(go.Scatter(
-        x=x_dates_all, y=pdf_type_all[col].tolist(),
-        name=col.title(), mode="lines+markers",
-        line=dict(color=color, width=2), marker=dict(size=4),
-        visible=True, legendgroup=col,
-    ), row=1, col=1)
-
-# ── GRAPH 1: bars ──
-for col, color in [("remarketing","#636EFA"),
-                   ("third party","#EF5538"),
-                   ("datacap","#00CC96")]:
-    fig.add_trace(go.Bar(
-        x=x_dates_all, y=pdf_type_all[col].tolist(),
-        name=col.title(), marker_color=color,
-        visible=False, legendgroup=col, showlegend=False,
-    ), row=1, col=1)
+with tracer.stage("combos") as st:
+    combo_data = {}
+    for branch in all_branches:
+        for type_col in all_types:
+            combo_data[(branch, type_col)] = combo_xy(cube_pdf, branch, type_col, axes)
+    st.set(combos=len(combo_data))
 
-n1 = 3
-
-# ── GRAPH 2: lines + bars ──
-traces_line_g2 = []
-traces_bar_g2  = []
-
-for src, sg in g2_structure:
-    y_vals = get_y_s2(pdf_s2_all, src, sg, date_vals_all)
-    color  = palette.get(sg, palette.get(src, "#777777"))
-
-    fig.add_trace(go.Scatter(
-        x=date_vals_all, y=y_vals,
-        name=f"{sg} ({src})", mode="lines+markers",
-        line=dict(width=2, color=color), marker=dict(size=4),
-        visible=False, legendgroup=sg, showlegend=True,
-    ), row=2, col=1)
-    traces_line_g2.append(len(fig.data) - 1)
-
-    fig.add_trace(go.Bar(
-        x=date_vals_all, y=y_vals,
-        name=f"{sg} ({src})", marker_color=color,
-        visible=False, legendgroup=sg, showlegend=False,
-    ), row=2, col=1)
-    traces_bar_g2.append(len(fig.data) - 1)
-
-total = len(fig.data)
-
-# ════════════════════════════════════════════════
-# ESTADO INICIAL
-# ════════════════════════════════════════════════
-for i in range(n1):
-    fig.data[i].visible = True
-for i in range(n1, n1 * 2):
-    fig.data[i].visible = False
-for i, (src, sg) in enumerate(g2_structure):
-    if src == "remarketing":
-        fig.data[traces_line_g2[i]].visible = True
-
-# ════════════════════════════════════════════════
-# BUTTONS G1
-# ════════════════════════════════════════════════
-def make_vis_g1(show_lines):
-    vis = [False] * total
-    for i in range(n1):
-        vis[i]      = show_lines
-        vis[i + n1] = not show_lines
-    for i, (src, sg) in enumerate(g2_structure):
-        if src == "remarketing":
-            vis[traces_line_g2[i]] = True
-    return vis
-
-buttons_g1 = [
-    dict(label="Lines", method="update", args=[{"visible": make_vis_g1(True)}]),
-    dict(label="Bars",  method="update", args=[{"visible": make_vis_g1(False)}]),
-]
-
-# ════════════════════════════════════════════════
-# BUTTONS G2
-# ════════════════════════════════════════════════
-buttons_g2 = []
-for src in ["remarketing", "third party", "datacap"]:
-    line_idx = [traces_line_g2[i] for i, (s,_) in enumerate(g2_structure) if s == src]
-    bar_idx  = [traces_bar_g2[i]  for i, (s,_) in enumerate(g2_structure) if s == src]
-
-    vis_lines = [False] * total
-    for i in range(n1):  vis_lines[i]      = True
-    for i in range(n1):  vis_lines[i + n1] = False
-    for i in line_idx:   vis_lines[i]      = True
-    buttons_g2.append(dict(label=f"{src.title()} Lines",
-                           method="update", args=[{"visible": vis_lines}]))
-
-    vis_bars = [False] * total
-    for i in range(n1):  vis_bars[i]      = True
-    for i in range(n1):  vis_bars[i + n1] = False
-    for i in bar_idx:    vis_bars[i]      = True
-    buttons_g2.append(dict(label=f"{src.title()} Bars",
-                           method="update", args=[{"visible": vis_bars}]))
+print(f"✅ {len(combo_data)} combinaciones calculadas")
 
 # ════════════════════════════════════════════════
 # BRANCH DROPDOWN — usa combo_data con type=All
@@ -247,7 +106,7 @@ for branch in all_branches:
         label=branch, method="update",
         args=[
             {"x": new_x, "y": new_y},
-            {"title": f"Forces VIZ | Branch: <b>{branch}</b> | Type: <b>All</b>"}
+            {"title": combo_title(branch, "All")}
         ]
     ))
 
@@ -261,18 +120,8 @@ for branch in all_branches:
 # Usamos un dropdown ÚNICO que tiene todas las combos
 # branch x type como opciones
 
-combo_buttons = []
-for branch in all_branches:
-    for type_col in all_types:
-        new_x, new_y = combo_data[(branch, type_col)]
-        combo_buttons.append(dict(
-            label=f"{branch} | {type_col}",
-            method="update",
-            args=[
-                {"x": new_x, "y": new_y},
-                {"title": f"Forces VIZ | Branch: <b>{branch}</b> | Type: <b>{type_col}</b>"}
-            ]
-        ))
+with tracer.stage("buttons"):
+    combo_buttons = make_combo_buttons(combo_data, all_branches, all_types)
 
 # Separamos en dos dropdowns visuales pero
 # cada uno filtra sobre la combo correcta
@@ -283,7 +132,7 @@ for branch in all_branches:
         label=branch, method="update",
         args=[
             {"x": new_x, "y": new_y},
-            {"title": f"Forces VIZ | Branch: <b>{branch}</b> | Type: <b>All</b>"}
+            {"title": combo_title(branch, "All")}
         ]
     ))
 
@@ -294,52 +143,65 @@ for type_col in all_types:
         label=type_col, method="update",
         args=[
             {"x": new_x, "y": new_y},
-            {"title": f"Forces VIZ | Branch: <b>All</b> | Type: <b>{type_col}</b>"}
+            {"title": combo_title("All", type_col)}
         ]
     ))
 
 # ════════════════════════════════════════════════
-# LAYOUT — dropdown combinado como solución real
+# FIGURA — dropdown combinado como solución real
 # ════════════════════════════════════════════════
-fig.update_layout(
-    title=dict(text="Forces VIZ | Branch: <b>All</b> | Type: <b>All</b>",
-               x=0.5, xanchor="center", font=dict(size=16)),
-    template="plotly_white",
-    hovermode="x unified",
-    height=950,
-    yaxis=dict( title="Count", type="log", showgrid=True, gridcolor="#f0f0f0"),
-    yaxis2=dict(title="Count", type="log", showgrid=True, gridcolor="#f0f0f0"),
-    xaxis=dict( type="date", showticklabels=False),
-    xaxis2=dict(type="date", title="Date"),
-    legend=dict(orientation="h", x=0.5, xanchor="center", y=-0.12),
-    margin=dict(t=160, b=100, l=60, r=40),
-    updatemenus=[
-        # ── Combo Branch x Type (dropdown único) ──
-        dict(buttons=combo_buttons, direction="down", showactive=True,
-             x=0.0, xanchor="left", y=1.15, yanchor="top",
-             bgcolor="#5B6EE1", font=dict(color="white")),
-        # ── G1 Lines/Bars ──
-        dict(buttons=buttons_g1, type="buttons", direction="right",
-             showactive=True, x=0.55, xanchor="left", y=1.15, yanchor="top",
-             bgcolor="#444", font=dict(color="white")),
-        # ── G2 source_type ──
-        dict(buttons=buttons_g2, type="buttons", direction="right",
-             showactive=True, x=0.5, xanchor="center", y=0.46, yanchor="top",
-             bgcolor="#2a2a2a", font=dict(color="white")),
-    ],
-    annotations=[
-        dict(text="<b>Branch x Type:</b>", x=0.0, y=1.18,
-             xref="paper", yref="paper", showarrow=False, font=dict(size=11)),
-    ]
-)
+WEBGL      = None    # None = Scattergl automático por encima de GL_POINTS puntos
+MAX_POINTS = 1000    # puntos por serie en el HTML dedup (histórico completo al hacer zoom)
+
+_, y_all = combo_data[("All", "All")]
+with tracer.stage("figure") as st:
+    fig = build_figure(x_dates, y_all, g2_structure, palette, combo_buttons, webgl=WEBGL,
+                       src_types=axes["src_types"])
+    st.set(traces=len(fig.data))
 
 fig.show()
 
+# ════════════════════════════════════════════════
+# ANOMALÍAS — todas las series branch x type x source_type x s2 a la vez
+# ════════════════════════════════════════════════
+SHOW_ANOMALIES = False  # matriz series x días de los MAX_S2 subgrupos del panel 2
+
+if SHOW_ANOMALIES:
+    with tracer.stage("anomalies") as st:
+        series_labels, series_mat = pack_series(cube_pdf, axes["day_axis"])
+        anomalies = analyze(series_mat)
+        flags     = flagged(anomalies, series_labels, axes["day_axis"])
+        st.set(series=len(series_labels), flagged=len(flags))
+    print(f"{'⚠️' if len(flags) else '✅'} {len(flags)} puntos marcados "
+          f"(z-score o >20%) en {len(series_labels)} series")
+    fig_anom = heatmap_figure(anomalies, series_labels, x_dates)
+    fig_anom.show()
+
 # ════════════════════════════════════════════════
 # EXPORT
 # ════════════════════════════════════════════════
+# un informe por país/subsidiaria sin relanzar este script por ámbito:
+# forces_batch.run_batch(backend, [("ES", "0049"), ...]) agrega una vez y pinta en paralelo
 OUTPUT_PATH = "/Workspace/Users/TU_EMAIL@dominio.com/forces_viz.html"
+SHARD_DIR   = "/Workspace/Users/TU_EMAIL@dominio.com/forces_viz/"
+OFFLINE_DIR = "/Workspace/Users/TU_EMAIL@dominio.com/forces_reports/"
+EXPORT_MODE = "dedup"   # "plotly" | "dedup" (tabla compartida) | "sharded" (índice + shards)
+                        # | "offline" (plotly.js local compartido + .gz/.br, sin CDN)
+
 os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-fig.write_html(OUTPUT_PATH, include_plotlyjs="cdn", full_html=True,
-               config={"scrollZoom": True})
+with tracer.stage("export") as st:
+    if EXPORT_MODE == "sharded":
+        OUTPUT_PATH = write_html_sharded(fig, combo_data, x_dates, SHARD_DIR)
+    elif EXPORT_MODE == "offline":
+        OUTPUT_PATH = write_html_offline(fig, combo_data, x_dates, OFFLINE_DIR,
+                                         max_points=MAX_POINTS)
+    elif EXPORT_MODE == "dedup":
+        write_html_dedup(fig, combo_data, x_dates, OUTPUT_PATH, max_points=MAX_POINTS)
+    else:
+        fig.write_html(OUTPUT_PATH, include_plotlyjs="cdn", full_html=True,
+                       config={"scrollZoom": True})
+    st.set(html_bytes=os.path.getsize(OUTPUT_PATH))
 print(f"✅ Exportado: {OUTPUT_PATH}")
+
+tracer.summary()
+tracer.dump(TRACE_PATH)
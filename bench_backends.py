@@ -0,0 +1,103 @@
+import argparse
+import os
+import tempfile
+import time
+
+from forces import (MAX_POINTS, extend_palette, build_axes, combo_xy, make_combo_buttons,
+                    build_figure, write_html_dedup)
+from forces_backend import SparkBackend, LocalBackend
+from forces_trace import Tracer
+from forces_anomaly import pack_series, analyze
+
+# ════════════════════════════════════════════════
+# BENCHMARK — Spark vs local sobre los mismos exports
+# ════════════════════════════════════════════════
+# Ejecuta el pipeline de GDPR.py (dimensiones, cube, combos, figura,
+# anomalías, HTML) con cada backend sobre el mismo directorio de
+# Parquet/CSV, mide la latencia de punta a punta (incluido el arranque de la
+# sesión Spark) y comprueba que las figuras salen idénticas.
+#
+#   python bench_backends.py /ruta/exports [--no-spark]
+
+def run_pipeline(backend, out_path, tracer=None, max_points=MAX_POINTS):
+    if tracer is None:
+        tracer = Tracer(spark=backend.data.sparkSession if backend.name == "spark" else None)
+
+    with tracer.stage("discover"):
+        dims, _ = backend.discover_dims()
+
+    with tracer.stage("aggregate") as st:
+        cube_pdf = backend.get_cube()
+        st.collected(cube_pdf)
+
+    with tracer.stage("combos"):
+        all_branches = ["All"] + dims["BRANCH"]
+        all_types    = ["All"] + dims["type_col"]
+        axes = build_axes(cube_pdf)
+        combo_data = {(b, ty): combo_xy(cube_pdf, b, ty, axes)
+                      for b in all_branches for ty in all_types}
+
+    with tracer.stage("figure"):
+        _, y_all = combo_data[("All", "All")]
+        fig = build_figure(axes["x_dates"], y_all, axes["g2_structure"],
+                           extend_palette(dims["source_type2_viz"]),
+                           make_combo_buttons(combo_data, all_branches, all_types),
+                           src_types=axes["src_types"])
+
+    with tracer.stage("anomalies") as st:
+        labels, mat = pack_series(cube_pdf, axes["day_axis"])
+        res = analyze(mat)
+        st.set(series=len(labels), flagged=int((res["anomaly"] | res["growth"]).sum()))
+
+    with tracer.stage("export"):
+        write_html_dedup(fig, combo_data, axes["x_dates"], out_path, max_points)
+    return fig, tracer.durations()
+
+def spark_backend(source):
+    from pyspark.sql import SparkSession
+    spark = SparkSession.builder.master("local[*]").appName("forces_bench").getOrCreate()
+    if any(f.endswith(".csv") for _, _, fs in os.walk(source) for f in fs):
+        data = spark.read.csv(source, header=True, inferSchema=True, recursiveFileLookup=True)
+    else:
+        data = spark.read.option("recursiveFileLookup", "true").parquet(source)
+    return SparkBackend(data)
+
+def main(source, use_spark=True):
+    makers = [("local", lambda: LocalBackend(source))]
+    if use_spark:
+        makers.append(("spark", lambda: spark_backend(source)))
+
+    results, figs = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make in makers:
+            t0 = time.perf_counter()
+            try:
+                backend = make()
+            except ImportError:
+                print(f"⚠️ {name}: backend no disponible, se omite")
+                continue
+            t_start = time.perf_counter() - t0
+            fig, t = run_pipeline(backend, os.path.join(tmp, f"{name}.html"))
+            t["startup"] = t_start
+            t["total"]   = sum(t.values())
+            results[name], figs[name] = t, fig.to_json()
+
+    stages = ["startup", "discover", "aggregate", "combos", "figure", "anomalies", "export",
+              "total"]
+    print(f"{'stage':<10}" + "".join(f"{n:>12}" for n in results))
+    for s in stages:
+        print(f"{s:<10}" + "".join(f"{results[n][s]:>11.2f}s" for n in results))
+
+    if len(figs) == 2:
+        # to_json serializa los arrays completos (también las y de los botones
+        # de combos); str(ndarray) los resumía a partir de 1000 elementos
+        a, b = figs.values()
+        print("✅ Figuras idénticas" if a == b else "❌ Las figuras difieren")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Spark vs local del forces VIZ")
+    parser.add_argument("source", help="Directorio o fichero con exports Parquet/CSV de df_result")
+    parser.add_argument("--no-spark", action="store_true")
+    args = parser.parse_args()
+    main(args.source, use_spark=not args.no_spark)
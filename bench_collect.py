@@ -0,0 +1,154 @@
+import argparse
+import json
+import multiprocessing as mp
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from forces import SRC_TYPES, compact_frame, iter_chunks
+from bench_forces import _peak_rss_mb
+
+# ════════════════════════════════════════════════
+# BENCHMARK — memoria del driver al recoger el cube
+# ════════════════════════════════════════════════
+# Mide el pico de RSS del proceso al traer un agregado de N filas con forma
+# de cube (BRANCH, type_col, source_type, source_type2_viz, cnt, s2_rollup,
+# day) por tres caminos, cada uno en un proceso limpio:
+#   rows     : iter_chunks por defecto (toLocalIterator) -> compact_frame
+#   arrow    : iter_chunks(arrow=True), vía opcional para agregados pequeños
+#              (toArrow trae la tabla entera antes de trocearla)
+#   topandas : toPandas() con Arrow (por defecto en Databricks): tabla Arrow
+#              -> DataFrame con las dimensiones como objetos str
+# El origen imita a Spark: la tabla Arrow se arma por lotes columnares y el
+# iterador de filas sale de un generador, así no ocupa memoria por sí mismo.
+# Además del pico se informa el coste de conversión por fila (µs/fila).
+#
+# El camino por defecto (rows) se mide también con la mitad de filas: lo
+# que crece el pico al doblar --rows no puede pasar de MAX_GROWTH veces lo
+# que crece el frame compacto más GROWTH_SLACK_MB (el lote de COLLECT_ROWS
+# filas y las arenas del allocator, que no dependen de --rows). Sale con
+# código 1 si no se cumple, si rows supera --max-mb MB de pico adicional o
+# si su frame ocupa más de FRAME_RATIO del de topandas.
+#
+#   python bench_collect.py --rows 2000000 --s2 500 --days 730
+
+MODES           = ["rows", "arrow", "topandas"]
+MAX_MB          = 512   # pico adicional máximo de rows (MB sobre el arranque)
+MAX_GROWTH      = 2.0   # crecimiento del pico / crecimiento del frame (rows/2 -> rows)
+GROWTH_SLACK_MB = 32    # parte fija del pico que no escala con las filas
+FRAME_RATIO     = 0.5   # frame de rows / frame de topandas
+BATCH           = 50_000
+
+class FakeSparkFrame:
+    # lo mínimo de un DataFrame de Spark para iter_chunks: columns,
+    # toArrow y toLocalIterator
+    columns = ["BRANCH", "type_col", "source_type", "source_type2_viz",
+               "cnt", "s2_rollup", "day"]
+
+    def __init__(self, n_rows, n_branches, n_types, n_s2, n_days, seed=42):
+        self.n_rows = n_rows
+        self.dims   = ([f"BR{i:03d}" for i in range(n_branches)] + ["All"],
+                       [f"TYPE_{i}" for i in range(n_types)] + ["All"],
+                       SRC_TYPES,
+                       [f"S2_{i:04d}" for i in range(n_s2)] + [None])
+        self.n_days = n_days
+        self.seed   = seed
+
+    def _batches(self):
+        rng = np.random.default_rng(self.seed)
+        for start in range(0, self.n_rows, BATCH):
+            n    = min(BATCH, self.n_rows - start)
+            cols = [np.asarray(d, dtype=object)[rng.integers(0, len(d), n)] for d in self.dims]
+            yield cols + [rng.integers(1, 10_000, n), pd.isna(cols[3]),
+                          (20_000 + rng.integers(0, self.n_days, n)).astype("int32")]
+
+    def toArrow(self):
+        return pa.Table.from_batches([pa.record_batch(list(b), names=self.columns)
+                                      for b in self._batches()])
+
+    def toLocalIterator(self, prefetchPartitions=False):
+        for b in self._batches():
+            yield from zip(*(c.tolist() for c in b))
+
+def _collect(mode, params, queue):
+    base   = _peak_rss_mb()
+    stream = FakeSparkFrame(**params)
+    t0     = time.perf_counter()
+    if mode == "topandas":
+        pdf = stream.toArrow().to_pandas()
+    else:
+        pdf = compact_frame(iter_chunks(stream, arrow=(mode == "arrow")))
+    wall = time.perf_counter() - t0
+    queue.put({"mode":         mode,
+               "rows":         len(pdf),
+               "wall_s":       round(wall, 3),
+               "us_per_row":   round(wall / max(len(pdf), 1) * 1e6, 2),
+               "frame_mb":     round(pdf.memory_usage(deep=True).sum() / 1024**2, 1),
+               "peak_rss_mb":  round(_peak_rss_mb(), 1),
+               "delta_rss_mb": round(_peak_rss_mb() - base, 1)})
+
+def run(mode, params):
+    ctx   = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc  = ctx.Process(target=_collect, args=(mode, params, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def check(results, half, max_mb=MAX_MB, max_growth=MAX_GROWTH):
+    by    = {r["mode"]: r for r in results}
+    rows  = by["rows"]
+    fails = []
+    grow_rss   = rows["delta_rss_mb"] - half["delta_rss_mb"]
+    grow_frame = rows["frame_mb"] - half["frame_mb"]
+    if grow_rss > max_growth * grow_frame + GROWTH_SLACK_MB:
+        fails.append(f"rows: el pico crece {grow_rss:.0f} MB de {half['rows']} a "
+                     f"{rows['rows']} filas, más de {max_growth:.1f} x el frame "
+                     f"(+{grow_frame:.0f} MB) + {GROWTH_SLACK_MB} MB")
+    if max_mb is not None and rows["delta_rss_mb"] > max_mb:
+        fails.append(f"rows +{rows['delta_rss_mb']:.0f} MB > {max_mb} MB")
+    if rows["frame_mb"] > FRAME_RATIO * by["topandas"]["frame_mb"]:
+        fails.append(f"rows frame {rows['frame_mb']:.0f} MB > "
+                     f"{FRAME_RATIO:.2f} x topandas ({by['topandas']['frame_mb']:.0f} MB)")
+    return fails
+
+def _print(r):
+    print(f"  {r['mode']:<9} {r['rows']:>10,} filas  frame={r['frame_mb']:>8.1f} MB  "
+          f"pico={r['peak_rss_mb']:>8.1f} MB  (+{r['delta_rss_mb']:.1f} MB)  "
+          f"{r['wall_s']:>6.2f}s ({r['us_per_row']:.2f} µs/fila)")
+
+def main(params, output=None, max_mb=MAX_MB, max_growth=MAX_GROWTH):
+    print(f"⏳ {params}")
+    half = run("rows", dict(params, n_rows=params["n_rows"] // 2))
+    _print(half)
+    results = [run(mode, params) for mode in MODES]
+    for r in results:
+        _print(r)
+    fails = check(results, half, max_mb, max_growth)
+    for f in fails:
+        print(f"  ❌ {f}")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"params": params, "half": half, "results": results, "fails": fails},
+                      f, indent=2)
+        print(f"✅ Informe: {output}")
+    return results, fails
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pico de memoria del driver al recoger el cube")
+    parser.add_argument("--rows",     type=int, default=1_000_000)
+    parser.add_argument("--branches", type=int, default=30)
+    parser.add_argument("--types",    type=int, default=6)
+    parser.add_argument("--s2",       type=int, default=300)
+    parser.add_argument("--days",     type=int, default=730)
+    parser.add_argument("--max-mb",     type=float, default=MAX_MB,
+                        help="tope absoluto del pico adicional (rows)")
+    parser.add_argument("--max-growth", type=float, default=MAX_GROWTH)
+    parser.add_argument("-o", "--output", help="fichero JSON del informe")
+    args = parser.parse_args()
+    _, fails = main(dict(n_rows=args.rows, n_branches=args.branches, n_types=args.types,
+                         n_s2=args.s2, n_days=args.days), args.output, args.max_mb, args.max_growth)
+    raise SystemExit(1 if fails else 0)
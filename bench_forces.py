@@ -0,0 +1,167 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from forces import SRC_TYPES
+from forces_backend import LocalBackend
+from bench_backends import run_pipeline
+
+# ════════════════════════════════════════════════
+# BENCHMARK SUITE — datos sintéticos con forma de df_result
+# ════════════════════════════════════════════════
+# Genera datasets con fechas, branches, type_col, subgrupos source_type2_viz
+# y filas ajustables, ejecuta el pipeline por etapas (discover, aggregate,
+# combos, figure, anomalies, export) en un proceso limpio por escenario y deja un
+# informe JSON con tiempos, tamaño del HTML y pico de memoria (RSS).
+#
+#   python bench_forces.py --preset small medium -o bench.json
+#   python bench_forces.py --preset medium --compare bench_prev.json
+
+PRESETS = {
+    "small":  dict(n_rows=20_000,    n_days=60,  n_branches=4,  n_types=2, n_s2=12),
+    "medium": dict(n_rows=500_000,   n_days=180, n_branches=12, n_types=4, n_s2=40),
+    "large":  dict(n_rows=3_000_000, n_days=730, n_branches=30, n_types=6, n_s2=60),
+}
+STAGES    = ["discover", "aggregate", "combos", "figure", "anomalies", "export"]
+TOLERANCE = 0.20   # --compare marca regresión si una métrica empeora más de un 20%
+MIN_DELTA = 0.25   # ... y, en tiempos, más de 0.25s (ruido en escenarios pequeños)
+
+def generate(n_rows, n_days, n_branches, n_types, n_s2, null_s2=0.05,
+             start="2025-01-01", seed=42):
+    # Filas (date, BRANCH, type_col, source_type, source_type2_viz, count) con
+    # estacionalidad semanal suave, como smooth_series en graficos.py.
+    rng   = np.random.default_rng(seed)
+    days  = rng.integers(0, n_days, n_rows)
+    src   = rng.integers(0, len(SRC_TYPES), n_rows)
+    s2    = rng.integers(0, n_s2, n_rows)
+    phase = rng.uniform(0, 2 * np.pi, n_s2)
+    base  = 1 + 0.08 * np.sin(2 * np.pi * days / 7 + phase[s2])
+    count = np.clip(rng.poisson(20 * base), 1, None)
+
+    s2_names = np.array([f"S2_{i:03d}" for i in range(n_s2)], dtype=object)
+    s2_vals  = s2_names[s2]
+    s2_vals[rng.random(n_rows) < null_s2] = None
+
+    return pd.DataFrame({
+        "date":             pd.Timestamp(start) + pd.to_timedelta(days, unit="D"),
+        "BRANCH":           np.array([f"BR{i:02d}" for i in range(n_branches)])[
+                                rng.integers(0, n_branches, n_rows)],
+        "type_col":         np.array([f"TYPE_{i}" for i in range(n_types)])[
+                                rng.integers(0, n_types, n_rows)],
+        "source_type":      np.array(SRC_TYPES)[src],
+        "source_type2_viz": s2_vals,
+        "count":            count.astype("int64"),
+    })
+
+def _peak_rss_mb():
+    # ru_maxrss: KB en Linux, bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if platform.system() == "Darwin" else rss / 1024
+
+def _run_scenario(params, queue):
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        generate(**params).to_parquet(os.path.join(tmp, "df_result.parquet"), index=False)
+        t_gen = time.perf_counter() - t0
+
+        html = os.path.join(tmp, "forces_viz.html")
+        fig, t = run_pipeline(LocalBackend(tmp), html)
+        queue.put({
+            "params":        params,
+            "generate_s":    round(t_gen, 4),
+            "stages_s":      {s: round(t[s], 4) for s in STAGES},
+            "total_s":       round(sum(t[s] for s in STAGES), 4),
+            "html_bytes":    os.path.getsize(html),
+            "peak_rss_mb":   round(_peak_rss_mb(), 1),
+        })
+
+def run_scenario(params):
+    # proceso nuevo por escenario: el pico de RSS no arrastra escenarios anteriores
+    ctx   = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc  = ctx.Process(target=_run_scenario, args=(params, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, previous, tolerance=TOLERANCE):
+    # mismas params -> compara total_s, html_bytes y peak_rss_mb
+    prev = {json.dumps(s["params"], sort_keys=True): s for s in previous["scenarios"]}
+    regressions = []
+    for s in report["scenarios"]:
+        old = prev.get(json.dumps(s["params"], sort_keys=True))
+        if old is None:
+            continue
+        for metric in ["total_s", "html_bytes", "peak_rss_mb"]:
+            slack = MIN_DELTA if metric == "total_s" else 0
+            if old[metric] and s[metric] > old[metric] * (1 + tolerance) + slack:
+                regressions.append({"scenario": s["name"], "metric": metric,
+                                    "before": old[metric], "after": s[metric]})
+    return regressions
+
+def main(scenarios, output=None, previous=None):
+    report = {
+        "version":   git_version(),
+        "python":    platform.python_version(),
+        "pandas":    pd.__version__,
+        "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "scenarios": [],
+    }
+    for name, params in scenarios:
+        print(f"⏳ {name}: {params}")
+        result = {"name": name, **run_scenario(params)}
+        report["scenarios"].append(result)
+        print(f"  ✅ {result['total_s']:.2f}s  "
+              + "  ".join(f"{s}={result['stages_s'][s]:.2f}" for s in STAGES)
+              + f"  html={result['html_bytes'] / 1024**2:.1f}MB"
+              + f"  rss={result['peak_rss_mb']:.0f}MB")
+
+    if previous:
+        with open(previous) as f:
+            report["regressions"] = compare(report, json.load(f))
+        for r in report["regressions"]:
+            print(f"  ❌ {r['scenario']} {r['metric']}: {r['before']} -> {r['after']}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Informe: {output}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del forces VIZ con datos sintéticos")
+    parser.add_argument("--preset", nargs="*", choices=sorted(PRESETS), default=["small"])
+    parser.add_argument("--rows",     type=int, help="escenario propio: filas")
+    parser.add_argument("--days",     type=int, default=90)
+    parser.add_argument("--branches", type=int, default=8)
+    parser.add_argument("--types",    type=int, default=3)
+    parser.add_argument("--s2",       type=int, default=20)
+    parser.add_argument("-o", "--output", help="fichero JSON del informe")
+    parser.add_argument("--compare", help="informe JSON anterior para detectar regresiones")
+    args = parser.parse_args()
+
+    scenarios = [(p, PRESETS[p]) for p in args.preset]
+    if args.rows:
+        scenarios.append(("custom", dict(n_rows=args.rows, n_days=args.days,
+                                         n_branches=args.branches, n_types=args.types,
+                                         n_s2=args.s2)))
+    report = main(scenarios, args.output, args.compare)
+    raise SystemExit(1 if report.get("regressions") else 0)
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from forces import MAX_POINTS
+from forces_backend import LocalBackend
+from bench_forces import PRESETS, generate
+from bench_backends import run_pipeline
+
+# ════════════════════════════════════════════════
+# BENCHMARK — re-render en el navegador (completo vs reducido)
+# ════════════════════════════════════════════════
+# Genera el HTML dedup dos veces con los mismos datos, sin reducir
+# (max_points=None) y con MAX_POINTS, lo abre en Chromium headless
+# (playwright) y recorre todas las combos del dropdown. Cada cambio de
+# combo queda medido en window.__forcesTimings (Plotly.restyle hasta que
+# termina de pintar); se informa mediana y p95 por modo.
+#
+#   pip install playwright && playwright install chromium
+#   python bench_render.py --days 1500 --branches 6 -o render.json
+
+def _timings(page, path, wait_ms):
+    page.goto("file://" + os.path.abspath(path))
+    page.wait_for_function("window.__forcesTimings && window.__forcesTimings.length > 0",
+                           timeout=wait_ms)
+    labels = page.evaluate("document.querySelector('.plotly-graph-div').layout"
+                           ".updatemenus[0].buttons.map(b => b.label)")
+    for i, label in enumerate(labels):
+        page.evaluate("l => document.querySelector('.plotly-graph-div')"
+                      ".emit('plotly_buttonclicked', {button: {label: l}})", label)
+        page.wait_for_function(f"window.__forcesTimings.length > {i + 1}", timeout=wait_ms)
+    # la primera medida es la carga inicial
+    return page.evaluate("window.__forcesTimings")[1:]
+
+def main(params, output=None, max_points=MAX_POINTS, wait_ms=120_000):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("⚠️ playwright no instalado: pip install playwright && playwright install chromium")
+        return None
+
+    print(f"⏳ {params}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, sync_playwright() as pw:
+        generate(**params).to_parquet(os.path.join(tmp, "df_result.parquet"), index=False)
+        browser = pw.chromium.launch()
+        page    = browser.new_page()
+        for mode, mp in (("full", None), ("downsampled", max_points)):
+            html = os.path.join(tmp, f"{mode}.html")
+            run_pipeline(LocalBackend(tmp), html, max_points=mp)
+            t = np.array(_timings(page, html, wait_ms))
+            results[mode] = {"combos": len(t),
+                             "html_bytes": os.path.getsize(html),
+                             "median_ms": round(float(np.median(t)), 1),
+                             "p95_ms": round(float(np.percentile(t, 95)), 1)}
+        browser.close()
+
+    for mode, r in results.items():
+        print(f"  {mode:<12} mediana={r['median_ms']:>8.1f} ms  p95={r['p95_ms']:>8.1f} ms  "
+              f"({r['combos']} combos, {r['html_bytes'] / 1024**2:.1f} MB)")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"params": params, "max_points": max_points, "results": results}, f,
+                      indent=2)
+        print(f"✅ Informe: {output}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de re-render por combo en Chromium")
+    parser.add_argument("--preset", choices=sorted(PRESETS))
+    parser.add_argument("--rows",     type=int, default=200_000)
+    parser.add_argument("--days",     type=int, default=1500)
+    parser.add_argument("--branches", type=int, default=6)
+    parser.add_argument("--types",    type=int, default=3)
+    parser.add_argument("--s2",       type=int, default=20)
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS)
+    parser.add_argument("-o", "--output", help="fichero JSON del informe")
+    args = parser.parse_args()
+
+    params = PRESETS[args.preset] if args.preset else dict(
+        n_rows=args.rows, n_days=args.days, n_branches=args.branches,
+        n_types=args.types, n_s2=args.s2)
+    main(params, args.output, args.max_points)
@@ -0,0 +1,749 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from plotly.colors import qualitative
+import os
+import json
+import base64
+import hashlib
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+
+# ════════════════════════════════════════════════
+# PALETTE
+# ════════════════════════════════════════════════
+PALETTE = {
+    "remarketing":          "#636EFA",
+    "third party":          "#EF5538",
+    "datacap":              "#00CC96",
+    "Customer":             "#1f77b4",
+    "Remarketing Dealer":   "#ff7f0e",
+    "Legal Representative": "#2ca02c",
+    "Shareholder":          "#d62728",
+    "Guarantor":            "#9467bd",
+    "Unknown":              "#8c564b",
+    "Supplier":             "#e377c2",
+    "Parent":               "#7f7f7f",
+    "CUS_CORPORATE":        "#bcbd22",
+    "CUS_PRIVATE":          "#17becf",
+    # deltas entre snapshots (forces_delta), como source_type extra
+    "delta new":            "#19D3F3",
+    "delta removed":        "#FF6692",
+    "delta changed":        "#FECB52",
+}
+
+DIMS       = ["BRANCH", "type_col", "date", "source_type", "source_type2_viz"]
+SRC_TYPES  = ["remarketing", "third party", "datacap"]
+SRC_COLORS = [("remarketing", "#636EFA"),
+              ("third party", "#EF5538"),
+              ("datacap",     "#00CC96")]
+# source_type opcionales: solo se pintan si aparecen en el cube
+EXTRA_SRC_TYPES = ["delta new", "delta removed", "delta changed"]
+
+MAX_VALUES = 5000   # tope de valores por dimensión que se traen al driver
+COLLECT_ROWS = 200_000  # filas por lote al traer agregados de Spark al driver
+CAT_COLS   = ["BRANCH", "type_col", "source_type", "source_type2_viz"]
+MAX_S2     = 60     # tope de trazas source_type2_viz en el panel 2
+GL_POINTS  = 20_000 # puntos en líneas a partir de los que se usa Scattergl (WebGL)
+MAX_POINTS = 1_000  # puntos por serie en el HTML; el detalle completo entra con zoom
+
+def extend_palette(all_s2):
+    palette = dict(PALETTE)
+    extra_colors = qualitative.Plotly * ((len(all_s2) // len(qualitative.Plotly)) + 1)
+    for i, s2 in enumerate(all_s2):
+        if s2 and s2 not in palette:
+            palette[s2] = extra_colors[i]
+    return palette
+
+# ════════════════════════════════════════════════
+# DIMENSIONES (BRANCH, type_col, source_type2_viz) — un solo job
+# ════════════════════════════════════════════════
+def discover_dims(data, cols=("BRANCH", "type_col", "source_type2_viz"),
+                  max_values=MAX_VALUES):
+    from pyspark.sql import functions as F
+
+    # Un único agg con collect_set por dimensión: cardinalidad exacta y como
+    # mucho max_values valores por dimensión viajan al driver.
+    aggs = []
+    for c in cols:
+        s = F.collect_set(c)
+        aggs += [F.size(s).alias(f"n_{c}"),
+                 F.slice(F.array_sort(s), 1, max_values).alias(c)]
+    row = data.agg(*aggs).first()
+    return report_dims({c: row[c] for c in cols}, {c: row[f"n_{c}"] for c in cols},
+                       max_values)
+
+def report_dims(values_by_dim, card, max_values=MAX_VALUES):
+    # valores ordenados por dimensión + cardinalidad exacta -> dims (sin
+    # vacíos, como mucho max_values) y avisos de los topes
+    dims = {}
+    for c, vals in values_by_dim.items():
+        dims[c] = [v for v in vals[:max_values] if v]
+        print(f"  📐 {c}: {card[c]} valores")
+        if card[c] > max_values:
+            print(f"  ⚠️ {c}: {card[c]} valores, solo se usan los {max_values} primeros")
+    if card.get("source_type2_viz", 0) > MAX_S2:
+        print(f"  ⚠️ source_type2_viz: {card['source_type2_viz']} subgrupos, el panel 2 "
+              f"se limita a los {MAX_S2} de mayor volumen")
+    return dims, card
+
+def dims_from_frame(pdf, cols=("BRANCH", "type_col", "source_type2_viz"),
+                    max_values=MAX_VALUES):
+    # mismo contrato que discover_dims, a partir de un agregado diario ya
+    # recogido (caché / incremental): sin otro scan de la entrada
+    vals = {c: sorted(pdf[c].dropna().unique()) for c in cols}
+    return report_dims(vals, {c: len(v) for c, v in vals.items()}, max_values)
+
+# ════════════════════════════════════════════════
+# RECOGIDA COMPACTA EN EL DRIVER
+# ════════════════════════════════════════════════
+# toPandas() materializa todo el resultado de golpe (y las dimensiones como
+# objetos str de Python). iter_chunks trae el agregado por lotes y
+# compact_frame va guardando cada lote como arrays numéricos: códigos por
+# dimensión (vocabulario único, el entero más pequeño en que caben), day int32
+# y counts int64. Al final las dimensiones son Categorical.
+#   - Por defecto toLocalIterator, partición a partición: en el driver solo
+#     hay un lote de chunk_rows filas además del frame compacto. En Spark
+#     Connect el iterador ya llega como lotes Arrow; en Spark clásico es un
+#     Row por fila (~4x más lento por fila, ver bench_collect).
+#   - arrow=True (Spark >= 4 / Connect, toArrow): vía rápida solo para
+#     agregados pequeños. toArrow trae el resultado entero al driver antes de
+#     trocearlo, así que el pico crece con el agregado.
+
+def iter_chunks(sdf, chunk_rows=COLLECT_ROWS, arrow=False):
+    if arrow and hasattr(sdf, "toArrow"):
+        import pyarrow as pa
+        batches = sdf.toArrow().to_batches()[::-1]
+        buf, n  = [], 0
+        while batches:
+            buf.append(batches.pop())
+            n += buf[-1].num_rows
+            if n >= chunk_rows or not batches:
+                yield pa.Table.from_batches(buf).to_pandas(strings_to_categorical=True)
+                buf, n = [], 0
+        return
+    cols, buf = sdf.columns, []
+    for row in sdf.toLocalIterator(prefetchPartitions=True):
+        buf.append(tuple(row))
+        if len(buf) >= chunk_rows:
+            yield pd.DataFrame.from_records(buf, columns=cols)
+            buf = []
+    if buf:
+        yield pd.DataFrame.from_records(buf, columns=cols)
+
+def compact_frame(chunks, cat_cols=CAT_COLS, int32_cols=("day",)):
+    vocab   = {c: {} for c in cat_cols}
+    codes   = {c: [] for c in cat_cols}
+    columns = None
+    other   = {}
+    for chunk in chunks:
+        columns = columns or list(chunk.columns)
+        for c in cat_cols:
+            cat = pd.Categorical(chunk[c])
+            # categorías del lote -> código global (el -1 de los nulos se mantiene)
+            remap = np.array([vocab[c].setdefault(v, len(vocab[c])) for v in cat.categories]
+                             + [-1], dtype=_code_dtype(len(vocab[c])))
+            codes[c].append(remap[cat.codes])
+        for c in chunk.columns:
+            if c not in vocab:
+                other.setdefault(c, []).append(
+                    chunk[c].to_numpy(dtype="int32" if c in int32_cols else None, copy=True))
+
+    if columns is None:
+        return pd.DataFrame(columns=cat_cols)
+    out = {}
+    for c in columns:
+        if c in vocab:
+            # categorías en orden alfabético: mismo orden que con columnas str
+            cats  = sorted(vocab[c])
+            rank  = {v: i for i, v in enumerate(cats)}
+            remap = np.array([rank[v] for v in vocab[c]] + [-1], dtype=_code_dtype(len(cats)))
+            col   = _concat_release(codes.pop(c), remap)
+            out[c] = pd.Categorical.from_codes(col, categories=cats, validate=False)
+        else:
+            out[c] = _concat_release(other.pop(c))
+    return pd.DataFrame(out, copy=False)
+
+def _code_dtype(n):
+    # entero con signo más pequeño para n categorías más el -1 de los nulos
+    return np.min_scalar_type(-n - 1)
+
+def _concat_release(parts, remap=None):
+    # np.concatenate, pero soltando cada lote en cuanto se copia: las páginas
+    # del destino se van tocando a la vez que se liberan las de los lotes, así
+    # el pico no llega a la columna duplicada. remap: códigos del lote ->
+    # códigos finales, aplicado al copiar
+    dtype = remap.dtype if remap is not None else np.result_type(*parts)
+    out   = np.empty(sum(len(p) for p in parts), dtype=dtype)
+    parts.reverse()
+    i = 0
+    while parts:
+        p = parts.pop()
+        out[i:i + len(p)] = p if remap is None else remap[p]
+        i += len(p)
+    return out
+
+# ════════════════════════════════════════════════
+# AGREGADO (cube branch x type x date x source_type x s2)
+# ════════════════════════════════════════════════
+def _epoch_day(F):
+    # fechas como epoch-days (int32): una sola conversión, el resto es aritmética
+    return F.datediff(F.to_date(F.col("date")), F.lit("1970-01-01")).cast("int").alias("day")
+
+CUBE_SQL = """
+SELECT CASE WHEN grouping(`BRANCH`)   = 1 THEN 'All' ELSE `BRANCH`   END AS `BRANCH`,
+       CASE WHEN grouping(`type_col`) = 1 THEN 'All' ELSE `type_col` END AS `type_col`,
+       `source_type`, `source_type2_viz`,
+       CAST(coalesce(sum(`count`), 0) AS BIGINT)                          AS `cnt`,
+       grouping(`source_type2_viz`) = 1                                   AS `s2_rollup`,
+       CAST(datediff(to_date(`date`), DATE'1970-01-01') AS INT)           AS `day`
+FROM {view}
+GROUP BY `date`, `source_type`, CUBE(`BRANCH`, `type_col`, `source_type2_viz`)
+"""
+
+def get_cube(data, chunk_rows=COLLECT_ROWS, arrow=False):
+    import uuid
+    from pyspark.sql import functions as F
+
+    # Un único job: agregado fino + solo los 8 grouping sets que se usan
+    # (date y source_type siempre; BRANCH / type_col / source_type2_viz pueden
+    # venir agregados). Con DataFrame.cube(*DIMS) el Expand generaba los 32 y
+    # el filtro por grouping_id llegaba después del shuffle; GROUP BY con
+    # CUBE parcial (Spark >= 3.1) se expresa en SQL sobre una vista temporal.
+    fine = (data.groupBy(*DIMS)
+                .agg(F.sum("count").alias("count")))
+    view = f"forces_fine_{uuid.uuid4().hex}"
+    fine.createOrReplaceTempView(view)
+    try:
+        sdf = data.sparkSession.sql(CUBE_SQL.format(view=view))
+        return compact_frame(iter_chunks(sdf, chunk_rows, arrow))
+    finally:
+        data.sparkSession.catalog.dropTempView(view)
+
+def get_fine(data, chunk_rows=COLLECT_ROWS, keys=(), arrow=False):
+    from pyspark.sql import functions as F
+
+    # agregado diario (sin rollups): lo que se guarda en la caché de snapshots.
+    # keys: columnas de agrupación extra delante de DIMS (p.ej. país/subsidiaria)
+    keys = list(keys)
+    sdf = (data.groupBy(*keys, *DIMS)
+               .agg(F.sum("count").alias("count"))
+               .select(*keys, "BRANCH", "type_col", "source_type", "source_type2_viz",
+                       F.coalesce(F.col("count"), F.lit(0)).cast("long").alias("count"),
+                       _epoch_day(F)))
+    pdf = compact_frame(iter_chunks(sdf, chunk_rows, arrow), CAT_COLS + keys)
+    pdf["date"] = pd.to_datetime(pdf.pop("day").astype("int64"), unit="D")
+    return pdf[keys + DIMS + ["count"]]
+
+def cube_from_fine(fine):
+    # Mismo resultado que get_cube pero en local, a partir del agregado diario:
+    # los 8 grouping sets (BRANCH, type_col, s2) x (date, source_type).
+    fine = fine.assign(day=pd.to_datetime(fine["date"]).values
+                             .astype("datetime64[D]").astype("int32"))
+    parts = []
+    for b_all in (False, True):
+        for t_all in (False, True):
+            for s2_all in (False, True):
+                keys = ["day", "source_type"]
+                if not b_all:  keys.append("BRANCH")
+                if not t_all:  keys.append("type_col")
+                if not s2_all: keys.append("source_type2_viz")
+                g = (fine.groupby(keys, dropna=False, sort=False, observed=True)["count"].sum()
+                         .reset_index(name="cnt"))
+                if b_all:  g["BRANCH"]   = "All"
+                if t_all:  g["type_col"] = "All"
+                if s2_all: g["source_type2_viz"] = None
+                g["s2_rollup"] = s2_all
+                parts.append(g)
+    pdf = pd.concat(parts, ignore_index=True)
+    pdf["cnt"] = pdf["cnt"].astype("int64")
+    return pdf[["BRANCH", "type_col", "source_type", "source_type2_viz",
+                "cnt", "s2_rollup", "day"]]
+
+def filter_df(cube_pdf, branch, type_col):
+    return cube_pdf[(cube_pdf["BRANCH"] == branch) & (cube_pdf["type_col"] == type_col)]
+
+def days_to_str(days):
+    return np.datetime_as_string(np.asarray(days).astype("datetime64[D]")).tolist()
+
+def build_axes(cube_pdf, max_s2=MAX_S2):
+    # eje de fechas común + estructura de trazas del panel 2, sacados de All x All
+    base_all = filter_df(cube_pdf, "All", "All")
+    day_axis = np.sort(base_all["day"].unique())
+
+    # source_type fijos + los opcionales que traiga el cube (deltas)
+    present   = set(base_all["source_type"].dropna().unique())
+    src_types = SRC_TYPES + [s for s in EXTRA_SRC_TYPES if s in present]
+
+    base_s2 = (base_all[~base_all["s2_rollup"] & base_all["source_type2_viz"].notna()]
+               .sort_values(["day", "source_type2_viz"]))
+    pairs   = base_s2[["source_type", "source_type2_viz"]].drop_duplicates()
+
+    if max_s2 is not None and len(pairs) > max_s2:
+        # solo los max_s2 subgrupos de mayor volumen; el panel 1 sigue sumándolo todo
+        top   = (base_s2.groupby(["source_type", "source_type2_viz"], observed=True)["cnt"].sum()
+                        .nlargest(max_s2).index)
+        keep  = pd.MultiIndex.from_frame(pairs).isin(top)
+        print(f"  ⚠️ Panel 2: {len(pairs)} trazas source_type2_viz, se muestran {max_s2}")
+        pairs = pairs[keep]
+
+    g2_structure = []
+    for src in src_types:
+        for s, sg in pairs.itertuples(index=False):
+            if s == src:
+                g2_structure.append((src, sg))
+
+    return {
+        "day_axis":     day_axis,
+        "x_dates":      days_to_str(day_axis),
+        "g2_structure": g2_structure,
+        "src_types":    src_types,
+        "src_index":    pd.Index(src_types),
+        "g2_index":     pd.MultiIndex.from_tuples(g2_structure,
+                                                  names=["source_type", "source_type2_viz"]),
+    }
+
+def build_matrix(day_axis, days, cols, cnt, n_cols):
+    # pivot denso (day_axis x n_cols) en orden Fortran: mat[:, j] es la y
+    # de la traza j como vista contigua, sin copias ni bucles en Python
+    rows = np.searchsorted(day_axis, np.asarray(days))
+    cols = np.asarray(cols)
+    keep = cols >= 0
+    mat  = np.zeros((len(day_axis), n_cols), dtype="int64", order="F")
+    np.add.at(mat, (rows[keep], cols[keep]), np.asarray(cnt)[keep])
+    return mat
+
+def get_mat_type(data, axes):
+    pdf = data[data["s2_rollup"]]
+    return build_matrix(axes["day_axis"], pdf["day"],
+                        axes["src_index"].get_indexer(pdf["source_type"]),
+                        pdf["cnt"], len(axes["src_index"]))
+
+def get_mat_s2(data, axes):
+    pdf  = data[~data["s2_rollup"] & data["source_type2_viz"].notna()]
+    keys = pd.MultiIndex.from_arrays([pdf["source_type"], pdf["source_type2_viz"]])
+    return build_matrix(axes["day_axis"], pdf["day"],
+                        axes["g2_index"].get_indexer(keys),
+                        pdf["cnt"], len(axes["g2_index"]))
+
+def combo_xy(cube_pdf, branch, type_col, axes):
+    # x/y de todas las trazas (una por serie, ambos paneles) para una combo
+    df_b = filter_df(cube_pdf, branch, type_col)
+    m1   = get_mat_type(df_b, axes)
+    m2   = get_mat_s2(df_b, axes)
+    x    = axes["x_dates"]
+
+    new_x, new_y = [], []
+    for j in range(len(axes["src_index"])):
+        new_x.append(x); new_y.append(m1[:, j])
+    for j in range(len(axes["g2_structure"])):
+        new_x.append(x); new_y.append(m2[:, j])
+    return new_x, new_y
+
+# ════════════════════════════════════════════════
+# FIGURA
+# ════════════════════════════════════════════════
+def combo_title(branch, type_col):
+    return f"Forces VIZ | Branch: <b>{branch}</b> | Type: <b>{type_col}</b>"
+
+def make_combo_buttons(combo_data, all_branches, all_types):
+    # dropdown único con todas las combos branch x type
+    combo_buttons = []
+    for branch in all_branches:
+        for type_col in all_types:
+            new_x, new_y = combo_data[(branch, type_col)]
+            combo_buttons.append(dict(
+                label=f"{branch} | {type_col}",
+                method="update",
+                args=[
+                    {"x": new_x, "y": new_y},
+                    {"title": combo_title(branch, type_col)}
+                ]
+            ))
+    return combo_buttons
+
+def build_figure(x_dates, y_all, g2_structure, palette, combo_buttons=None, webgl=None,
+                 src_types=None):
+    # src_types: axes["src_types"] (SRC_TYPES + extras como los deltas)
+    src_types  = src_types or SRC_TYPES
+    src_colors = [(s, dict(SRC_COLORS).get(s, palette.get(s, "#777777"))) for s in src_types]
+
+    # webgl=None -> automático: Scattergl si las líneas suman más de GL_POINTS
+    if webgl is None:
+        webgl = len(x_dates) * (len(src_colors) + len(g2_structure)) > GL_POINTS
+    Line      = go.Scattergl if webgl else go.Scatter
+    line_type = "scattergl" if webgl else "scatter"
+
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=("Counts by Date – summed per source_type",
+                        "Counts by Date – summed per source_type2_viz"),
+        vertical_spacing=0.18,
+        shared_xaxes=True,
+    )
+
+    # Una sola traza por serie: Lines/Bars cambian el tipo con restyle y
+    # los botones solo tocan las trazas de su panel.
+
+    # ── GRAPH 1 ──
+    for j, (col, color) in enumerate(src_colors):
+        fig.add_trace(Line(
+            x=x_dates, y=y_all[j],
+            name=col.title(), mode="lines+markers",
+            line=dict(color=color, width=2), marker=dict(size=4, color=color),
+            visible=True, legendgroup=col,
+        ), row=1, col=1)
+
+    n1     = len(src_colors)
+    idx_g1 = list(range(n1))
+
+    # ── GRAPH 2 ──
+    idx_g2 = []
+    for i, (src, sg) in enumerate(g2_structure):
+        color = palette.get(sg, palette.get(src, "#777777"))
+
+        # ── ESTADO INICIAL: remarketing en líneas ──
+        fig.add_trace(Line(
+            x=x_dates, y=y_all[n1 + i],
+            name=f"{sg} ({src})", mode="lines+markers",
+            line=dict(width=2, color=color), marker=dict(size=4, color=color),
+            visible=src == "remarketing", legendgroup=sg, showlegend=True,
+        ), row=2, col=1)
+        idx_g2.append(len(fig.data) - 1)
+
+    # ── BUTTONS G1 ──
+    buttons_g1 = [
+        dict(label="Lines", method="restyle", args=[{"type": line_type}, idx_g1]),
+        dict(label="Bars",  method="restyle", args=[{"type": "bar"},     idx_g1]),
+    ]
+
+    # ── BUTTONS G2 ──
+    buttons_g2 = []
+    for src in src_types:
+        vis = [s == src for s, _ in g2_structure]
+        buttons_g2.append(dict(label=f"{src.title()} Lines", method="restyle",
+                               args=[{"visible": vis, "type": line_type}, idx_g2]))
+        buttons_g2.append(dict(label=f"{src.title()} Bars", method="restyle",
+                               args=[{"visible": vis, "type": "bar"}, idx_g2]))
+
+    # ── LAYOUT ──
+    updatemenus = [
+        # ── G1 Lines/Bars ──
+        dict(buttons=buttons_g1, type="buttons", direction="right",
+             showactive=True, x=0.55, xanchor="left", y=1.15, yanchor="top",
+             bgcolor="#444", font=dict(color="white")),
+        # ── G2 source_type ──
+        dict(buttons=buttons_g2, type="buttons", direction="right",
+             showactive=True, x=0.5, xanchor="center", y=0.46, yanchor="top",
+             bgcolor="#2a2a2a", font=dict(color="white")),
+    ]
+    annotations = []
+    if combo_buttons is not None:
+        # ── Combo Branch x Type (dropdown único) ──
+        updatemenus.insert(0, dict(buttons=combo_buttons, direction="down", showactive=True,
+                                   x=0.0, xanchor="left", y=1.15, yanchor="top",
+                                   bgcolor="#5B6EE1", font=dict(color="white")))
+        annotations.append(dict(text="<b>Branch x Type:</b>", x=0.0, y=1.18,
+                                xref="paper", yref="paper", showarrow=False,
+                                font=dict(size=11)))
+
+    fig.update_layout(
+        title=dict(text=combo_title("All", "All"),
+                   x=0.5, xanchor="center", font=dict(size=16)),
+        template="plotly_white",
+        hovermode="x unified",
+        height=950,
+        yaxis=dict( title="Count", type="log", showgrid=True, gridcolor="#f0f0f0"),
+        yaxis2=dict(title="Count", type="log", showgrid=True, gridcolor="#f0f0f0"),
+        xaxis=dict( type="date", showticklabels=False),
+        xaxis2=dict(type="date", title="Date"),
+        legend=dict(orientation="h", x=0.5, xanchor="center", y=-0.12),
+        margin=dict(t=160, b=100, l=60, r=40),
+        updatemenus=updatemenus,
+        annotations=annotations,
+    )
+    return fig
+
+# ════════════════════════════════════════════════
+# DOWNSAMPLING — min/max por bucket
+# ════════════════════════════════════════════════
+# Con históricos largos cada serie se reduce a su mínimo y su máximo por
+# bucket de días, cada uno en el día en que ocurrió (un solo punto si
+# coinciden). Cada serie reducida lleva sus posiciones en el eje x completo,
+# así que la tabla sigue compartiendo un único eje de fechas.
+
+def bucket_size(n_days, max_points=MAX_POINTS):
+    return max(1, -(-n_days // max(max_points // 2, 1)))
+
+def downsample_minmax(y, k):
+    # -> (posiciones int32 en el eje completo, valores)
+    y   = np.asarray(y)
+    n   = len(y)
+    nb  = -(-n // k)
+    pad = nb * k - n
+    # el relleno repite el último valor: argmin/argmax devuelven la primera
+    # aparición, nunca una posición del relleno
+    yb  = np.concatenate([y, np.repeat(y[-1:], pad)]).reshape(nb, k)
+    lo, hi = yb.argmin(axis=1), yb.argmax(axis=1)
+    base   = np.arange(nb) * k
+    pos    = np.column_stack([base + np.minimum(lo, hi), base + np.maximum(lo, hi)])
+    keep   = np.column_stack([np.ones(nb, dtype=bool), lo != hi]).ravel()
+    pos    = np.minimum(pos.ravel()[keep], n - 1).astype("int32")
+    return pos, y[pos]
+
+# ════════════════════════════════════════════════
+# EXPORT — tabla de datos deduplicada
+# ════════════════════════════════════════════════
+def build_data_table(combo_data, x_dates, max_points=None):
+    # Cada serie distinta se guarda una sola vez (base64 de un typed array);
+    # las combos solo guardan la lista de claves, una por traza. Con
+    # max_points y más días que eso se añade T.ds: por cada serie reducida
+    # con downsample_minmax, sus valores y sus posiciones en T.x.
+    max_cnt = max((int(y.max()) for _, ys in combo_data.values() for y in ys if len(y)),
+                  default=0)
+    dtype   = "<i4" if max_cnt < 2**31 else "<f8"
+    series  = {}
+
+    def enc(a, dt):
+        return np.ascontiguousarray(a, dtype=dt).tobytes()
+
+    def add(y):
+        raw = enc(y, dtype)
+        key = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        if key not in series:
+            series[key] = base64.b64encode(raw).decode("ascii")
+        return key
+
+    combos = {f"{b} | {t}": [add(y) for y in ys] for (b, t), (_, ys) in combo_data.items()}
+    table  = {"dtype": "i4" if dtype == "<i4" else "f8",
+              "x": x_dates, "series": series, "combos": combos}
+
+    if max_points and len(x_dates) > max_points:
+        k = bucket_size(len(x_dates), max_points)
+        ds_series = {}
+
+        def add_ds(y):
+            pos, val = downsample_minmax(y, k)
+            raw_p, raw_v = enc(pos, "<i4"), enc(val, dtype)
+            key = hashlib.blake2b(raw_p + raw_v, digest_size=8).hexdigest()
+            if key not in ds_series:
+                ds_series[key] = [base64.b64encode(raw_p).decode("ascii"),
+                                  base64.b64encode(raw_v).decode("ascii")]
+            return key
+
+        table["ds"] = {
+            "k":      k,
+            "series": ds_series,
+            "combos": {f"{b} | {t}": [add_ds(y) for y in ys]
+                       for (b, t), (_, ys) in combo_data.items()},
+        }
+    return table
+
+DECODE_JS = """
+function decode(b64, dtype) {
+    var s = atob(b64), u = new Uint8Array(s.length);
+    for (var i = 0; i < s.length; i++) u[i] = s.charCodeAt(i);
+    return dtype === "i4" ? new Int32Array(u.buffer) : new Float64Array(u.buffer);
+}
+"""
+
+DEDUP_JS = DECODE_JS + """
+var gd = document.getElementById('{plot_id}');
+var T  = %s;
+var cache = {}, current = %s, zoomed = false;
+window.__forcesTimings = [];
+function serie(k) {
+    if (!(k in cache)) cache[k] = decode(T.series[k], T.dtype);
+    return cache[k];
+}
+function serieDs(k) {
+    // serie reducida: cada punto en su día real (posiciones sobre T.x)
+    var c = 'ds:' + k;
+    if (!(c in cache)) {
+        var pos = decode(T.ds.series[k][0], 'i4');
+        cache[c] = {x: Array.from(pos, function (i) { return T.x[i]; }),
+                    y: decode(T.ds.series[k][1], T.dtype)};
+    }
+    return cache[c];
+}
+function applyCombo(label) {
+    // sin zoom se pintan las series reducidas (T.ds); con zoom, las completas
+    var ds = T.ds && !zoomed;
+    var keys = (ds ? T.ds.combos : T.combos)[label];
+    if (!keys) return;
+    current = label;
+    var t0 = performance.now();
+    var upd = ds ? {x: keys.map(function (k) { return serieDs(k).x; }),
+                    y: keys.map(function (k) { return serieDs(k).y; })}
+                 : {x: keys.map(function () { return T.x; }), y: keys.map(serie)};
+    Plotly.restyle(gd, upd)
+        .then(function () { window.__forcesTimings.push(performance.now() - t0); });
+}
+gd.on('plotly_buttonclicked', function (e) { applyCombo(e.button.label); });
+if (T.ds) gd.on('plotly_relayout', function (e) {
+    var keys = Object.keys(e), z;
+    if (keys.some(function (k) { return /^xaxis2?\\.autorange/.test(k); })) z = false;
+    else if (keys.some(function (k) { return /^xaxis2?\\.range/.test(k); })) z = true;
+    else return;
+    if (z !== zoomed) { zoomed = z; applyCombo(current); }
+});
+applyCombo(current);
+"""
+
+def strip_figure(fig):
+    # copia sin datos: las trazas se rellenan desde JS al cargar y los
+    # botones del dropdown de combos solo cambian el título
+    out = go.Figure(fig)
+    for tr in out.data:
+        tr.x, tr.y = [], []
+    out.layout.updatemenus[0].buttons = [
+        dict(label=b.label, method="relayout", args=[b.args[1]])
+        for b in out.layout.updatemenus[0].buttons
+    ]
+    return out
+
+def write_html_dedup(fig, combo_data, x_dates, path, max_points=MAX_POINTS,
+                     include_plotlyjs="cdn"):
+    table = build_data_table(combo_data, x_dates, max_points)
+    post  = DEDUP_JS % (json.dumps(table, separators=(",", ":")), json.dumps("All | All"))
+    strip_figure(fig).write_html(path, include_plotlyjs=include_plotlyjs, full_html=True,
+                                 config={"scrollZoom": True}, post_script=post)
+    print(f"  📦 {len(table['series'])} series distintas para "
+          f"{sum(len(k) for k in table['combos'].values())} trazas")
+    if "ds" in table:
+        print(f"  📉 {len(x_dates)} días -> como mucho "
+              f"{2 * -(-len(x_dates) // table['ds']['k'])} puntos por serie "
+              f"(detalle completo al hacer zoom)")
+
+# ════════════════════════════════════════════════
+# EXPORT — índice ligero + un shard por branch (o branch x type)
+# ════════════════════════════════════════════════
+# index.html lleva la figura vacía y el eje x; cada shard es un .js con la
+# tabla deduplicada de sus combos que se inyecta con <script> solo al
+# seleccionarla (funciona también abriendo el HTML como file://).
+
+SHARD_JS = DECODE_JS + """
+var gd = document.getElementById('{plot_id}');
+var S  = %s;
+var loaded = {}, pending = {}, cache = {};
+window.__forcesShard = function (file, T) {
+    loaded[file] = T;
+    (pending[file] || []).forEach(function (cb) { cb(T); });
+    delete pending[file];
+};
+function withShard(file, cb) {
+    if (loaded[file]) return cb(loaded[file]);
+    if (pending[file]) return pending[file].push(cb);
+    pending[file] = [cb];
+    var s = document.createElement('script');
+    s.src = S.dir + '/' + file;
+    document.head.appendChild(s);
+}
+function applyCombo(label) {
+    var file = S.shards[label];
+    if (!file) return;
+    withShard(file, function (T) {
+        var keys = T.combos[label];
+        Plotly.restyle(gd, {
+            x: keys.map(function () { return S.x; }),
+            y: keys.map(function (k) {
+                var c = file + ':' + k;
+                if (!(c in cache)) cache[c] = decode(T.series[k], T.dtype);
+                return cache[c];
+            })
+        });
+    });
+}
+gd.on('plotly_buttonclicked', function (e) { applyCombo(e.button.label); });
+applyCombo(%s);
+"""
+
+def _write_shard(args):
+    path, file, combos, x_dates = args
+    table = build_data_table(combos, x_dates)
+    del table["x"]   # el eje x va una sola vez en index.html
+    with open(path, "w") as f:
+        f.write(f"window.__forcesShard({json.dumps(file)},"
+                f"{json.dumps(table, separators=(',', ':'))});")
+    return os.path.getsize(path)
+
+def write_html_sharded(fig, combo_data, x_dates, out_dir, shard_by="branch", workers=4,
+                       include_plotlyjs="cdn"):
+    shard_dir = os.path.join(out_dir, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    groups = {}
+    for (branch, type_col), xy in combo_data.items():
+        key = branch if shard_by == "branch" else (branch, type_col)
+        groups.setdefault(key, {})[(branch, type_col)] = xy
+
+    shards, jobs = {}, []
+    for i, combos in enumerate(groups.values()):
+        file = f"shard_{i:04d}.js"
+        for branch, type_col in combos:
+            shards[f"{branch} | {type_col}"] = file
+        jobs.append((os.path.join(shard_dir, file), file, combos, x_dates))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(_write_shard, jobs))
+
+    post = SHARD_JS % (json.dumps({"dir": "shards", "x": x_dates, "shards": shards},
+                                  separators=(",", ":")),
+                       json.dumps("All | All"))
+    index = os.path.join(out_dir, "index.html")
+    strip_figure(fig).write_html(index, include_plotlyjs=include_plotlyjs, full_html=True,
+                                 config={"scrollZoom": True}, post_script=post)
+    print(f"  📦 {len(jobs)} shards ({sum(sizes) / 1024**2:.1f} MB) + "
+          f"índice {os.path.getsize(index) / 1024:.0f} KB")
+    return index
+
+# ════════════════════════════════════════════════
+# EXPORT — offline (plotly.js local compartido + precomprimidos)
+# ════════════════════════════════════════════════
+# Para entornos sin red: un único plotly-<versión>.min.js junto a los
+# informes (se escribe una vez y lo comparten todos), la figura en JSON
+# compacto y hermanos .gz/.br de cada fichero para servirlos estáticos.
+
+def write_plotlyjs(out_dir):
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+    name = f"plotly-{get_plotlyjs_version()}.min.js"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(path + ".tmp", path)
+        print(f"  📦 {name} ({os.path.getsize(path) / 1024**2:.1f} MB, compartido)")
+    return name
+
+def precompress(paths, brotli_quality=11):
+    # .gz siempre; .br si está instalado brotli. Se salta si ya está al día.
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("  ⚠️ brotli no instalado: solo se generan .gz")
+    for path in paths:
+        mtime = os.path.getmtime(path)
+        with open(path, "rb") as f:
+            raw = f.read()
+        if not (os.path.exists(path + ".gz") and os.path.getmtime(path + ".gz") >= mtime):
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+        if brotli is not None and not (os.path.exists(path + ".br")
+                                       and os.path.getmtime(path + ".br") >= mtime):
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(raw, quality=brotli_quality))
+
+def write_html_offline(fig, combo_data, x_dates, out_dir, name="forces_viz.html",
+                       max_points=MAX_POINTS, compress=True):
+    os.makedirs(out_dir, exist_ok=True)
+    js   = write_plotlyjs(out_dir)
+    path = os.path.join(out_dir, name)
+    write_html_dedup(fig, combo_data, x_dates, path, max_points, include_plotlyjs=js)
+    if compress:
+        precompress([os.path.join(out_dir, js), path])
+        gz = os.path.getsize(path + ".gz")
+        print(f"  📦 {name}: {os.path.getsize(path) / 1024**2:.1f} MB "
+              f"(gzip {gz / 1024**2:.1f} MB)")
+    return path
@@ -0,0 +1,174 @@
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from forces import MAX_S2, days_to_str
+from forces_exhaustivity import GROWTH_THRESHOLD
+
+# ════════════════════════════════════════════════
+# ANOMALÍAS Y DELTAS — todas las series en un solo array
+# ════════════════════════════════════════════════
+# graficos.py calcula los Δ con un diff() por columna sobre 4 categorías.
+# Aquí cada serie (BRANCH, type_col, source_type, source_type2_viz) es una
+# fila de una matriz (series x días) y diff, media/desviación móviles,
+# z-score y la regla del >20% salen de unas pocas operaciones NumPy sobre
+# la matriz entera (sumas acumuladas para las ventanas móviles).
+# Solo entran los MAX_S2 subgrupos del panel 2; la matriz y los resultados
+# van en float32 y analyze trabaja por bloques de BLOCK_ROWS series (los
+# intermedios en float64 no pasan de un bloque).
+#
+#   python forces_anomaly.py --series 5000 --days 365   (benchmark vs bucle)
+
+SERIES_KEYS = ["BRANCH", "type_col", "source_type", "source_type2_viz"]
+WINDOW      = 7      # días anteriores para media/desviación móviles
+Z_THRESHOLD = 3.0
+BLOCK_ROWS  = 2048   # series por bloque en analyze
+
+def pack_series(cube_pdf, day_axis=None, keys=SERIES_KEYS, max_s2=MAX_S2, dtype="float32"):
+    # nivel más fino del cube (sin "All" ni rollup de s2) -> (labels, matriz)
+    pdf = cube_pdf[(cube_pdf["BRANCH"] != "All") & (cube_pdf["type_col"] != "All")
+                   & ~cube_pdf["s2_rollup"]]
+    if max_s2 is not None:
+        # mismos subgrupos que el panel 2 (build_axes): los max_s2 pares
+        # (source_type, s2) de mayor volumen; las series sin s2 se quedan
+        vol = pdf.groupby(["source_type", "source_type2_viz"], observed=True)["cnt"].sum()
+        if len(vol) > max_s2:
+            pair = pd.MultiIndex.from_frame(pdf[["source_type", "source_type2_viz"]])
+            pdf  = pdf[pair.isin(vol.nlargest(max_s2).index)
+                       | pdf["source_type2_viz"].isna().to_numpy()]
+    if day_axis is None:
+        day_axis = np.sort(cube_pdf["day"].unique())
+    codes, labels = pd.MultiIndex.from_frame(pdf[keys].astype(object).fillna("")).factorize()
+    mat = np.zeros((len(labels), len(day_axis)), dtype=dtype)
+    np.add.at(mat, (codes, np.searchsorted(day_axis, pdf["day"].to_numpy())),
+              pdf["cnt"].to_numpy())
+    return labels, mat
+
+def analyze(mat, window=WINDOW, z_threshold=Z_THRESHOLD, growth=GROWTH_THRESHOLD,
+            block=BLOCK_ROWS, dtype="float32"):
+    # resultados (series x días) en dtype; cada bloque se calcula en float64
+    # (las sumas acumuladas de cuadrados no aguantan float32) y se suelta
+    n, d = mat.shape
+    res  = {k: np.empty((n, d), dtype) for k in ("diff", "pct", "mean", "std", "z")}
+    res.update(anomaly=np.empty((n, d), bool), growth=np.empty((n, d), bool))
+    for i in range(0, n, block):
+        part = _analyze_block(np.asarray(mat[i:i + block], dtype="float64"),
+                              window, z_threshold, growth)
+        for k, v in part.items():
+            res[k][i:i + block] = v
+    return res
+
+def _analyze_block(mat, window, z_threshold, growth):
+    n, d = mat.shape
+    prev = np.full_like(mat, np.nan)
+    prev[:, 1:] = mat[:, :-1]
+    diff = mat - prev
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(prev > 0, diff / prev, np.nan)
+    del prev
+
+    # ventana = los `window` días anteriores (sin el propio día), std con ddof=1
+    c1 = np.zeros((n, d + 1))
+    c2 = np.zeros((n, d + 1))
+    np.cumsum(mat,      axis=1, out=c1[:, 1:])
+    np.cumsum(mat ** 2, axis=1, out=c2[:, 1:])
+    mean = np.full_like(mat, np.nan)
+    std  = np.full_like(mat, np.nan)
+    if d > window:
+        s1 = c1[:, window:d] - c1[:, :d - window]
+        s2 = c2[:, window:d] - c2[:, :d - window]
+        mean[:, window:] = s1 / window
+        var = (s2 - window * mean[:, window:] ** 2) / max(window - 1, 1)
+        std[:, window:]  = np.sqrt(np.clip(var, 0, None))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (mat - mean) / std, np.nan)
+    return {
+        "diff":    diff,
+        "pct":     pct,
+        "mean":    mean,
+        "std":     std,
+        "z":       z,
+        "anomaly": np.abs(np.nan_to_num(z)) > z_threshold,
+        "growth":  np.nan_to_num(pct) > growth,
+    }
+
+def flagged(res, labels, day_axis, keys=SERIES_KEYS):
+    # puntos marcados (anomalía o >20%) en formato largo
+    rows, cols = np.nonzero(res["anomaly"] | res["growth"])
+    out = pd.DataFrame(np.asarray(labels.tolist(), dtype=object)[rows] if len(rows) else
+                       np.empty((0, len(keys)), dtype=object), columns=keys)
+    out["date"]    = pd.to_datetime(days_to_str(np.asarray(day_axis)[cols]))
+    out["z"]       = res["z"][rows, cols]
+    out["pct"]     = res["pct"][rows, cols]
+    out["anomaly"] = res["anomaly"][rows, cols]
+    out["growth"]  = res["growth"][rows, cols]
+    return out
+
+def heatmap_figure(res, labels, x_dates, value="z", top=40):
+    # mismo estilo que el mapa de calor de graficos.py, con las `top` series
+    # con más puntos marcados
+    score = (res["anomaly"] | res["growth"]).sum(axis=1)
+    rows  = np.argsort(-score, kind="stable")[:top]
+    names = [" | ".join(str(v) for v in labels[i] if v != "") for i in rows]
+    fig = px.imshow(
+        pd.DataFrame(res[value][rows], index=names, columns=x_dates),
+        aspect="auto", origin="lower",
+        color_continuous_scale="RdYlGn",
+        title=f"Mapa de calor – {value} por serie ({len(rows)} de {len(labels)})",
+        labels=dict(x="Fecha", y="Serie", color=value),
+    )
+    fig.update_layout(template="plotly_white", height=max(400, 18 * len(rows) + 200))
+    return fig
+
+# ════════════════════════════════════════════════
+# BENCHMARK — bucle por columna (graficos.py) vs matriz
+# ════════════════════════════════════════════════
+def analyze_loop(df, window=WINDOW, z_threshold=Z_THRESHOLD, growth=GROWTH_THRESHOLD):
+    # referencia: una columna por serie, como el bucle de deltas de graficos.py
+    out = {}
+    for c in df.columns:
+        s    = df[c]
+        mean = s.shift().rolling(window).mean()
+        std  = s.shift().rolling(window).std()
+        z    = (s - mean) / std.where(std > 0)
+        out[c] = {"diff": s.diff(), "z": z,
+                  "anomaly": z.abs() > z_threshold,
+                  "growth":  s.pct_change(fill_method=None) > growth}
+    return out
+
+def bench(n_series=2000, n_days=365, seed=42):
+    rng = np.random.default_rng(seed)
+    t   = np.arange(n_days)
+    mat = rng.poisson(200 * (1 + 0.08 * np.sin(2 * np.pi * t / 7)), (n_series, n_days))
+    mat = mat.astype("float64")
+    df  = pd.DataFrame(mat.T, columns=[f"s{i}" for i in range(n_series)])
+
+    t0  = time.perf_counter()
+    ref = analyze_loop(df)
+    t_loop = time.perf_counter() - t0
+    t0  = time.perf_counter()
+    res = analyze(mat)
+    t_vec = time.perf_counter() - t0
+
+    # las banderas se comparan fuera del umbral exacto (|z| == 3 por redondeo)
+    z_ref = np.array([ref[c]["z"].to_numpy() for c in df.columns])
+    a_ref = np.array([ref[c]["anomaly"].to_numpy() for c in df.columns])
+    edge  = np.isclose(np.abs(np.nan_to_num(z_ref)), Z_THRESHOLD, atol=1e-6)
+    same  = (np.allclose(z_ref, res["z"], equal_nan=True, atol=1e-6)
+             and np.array_equal(a_ref[~edge], res["anomaly"][~edge]))
+    print(f"📐 {n_series} series x {n_days} días")
+    print(f"  bucle por columna: {t_loop:8.3f}s")
+    print(f"  matriz NumPy:      {t_vec:8.3f}s  (x{t_loop / t_vec:.0f})")
+    print("✅ Mismos z-scores y anomalías" if same else "❌ Los resultados difieren")
+    return t_loop, t_vec
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del motor de anomalías")
+    parser.add_argument("--series", type=int, default=2000)
+    parser.add_argument("--days",   type=int, default=365)
+    args = parser.parse_args()
+    bench(args.series, args.days)
@@ -0,0 +1,177 @@
+import os
+import glob
+import hashlib
+
+import pandas as pd
+
+from forces import (DIMS, MAX_VALUES, discover_dims, dims_from_frame, get_fine, get_cube,
+                    cube_from_fine)
+
+# ════════════════════════════════════════════════
+# BACKENDS DE EJECUCIÓN
+# ════════════════════════════════════════════════
+# La capa de agregación (dimensiones, agregado diario, cube) detrás de una
+# misma interfaz:
+#   discover_dims()  -> (dims, card)
+#   get_fine()       -> agregado diario (DIMS + count)
+#   get_cube()       -> cube_pdf
+#   since(cutoff)    -> mismo backend con date >= cutoff (modo incremental)
+#   scoped(cols, scopes) -> mismo backend solo con esos ámbitos (país, subsidiaria...)
+#   fingerprint()    -> huella de la entrada (caché de snapshots)
+# SparkBackend trabaja sobre df_result; LocalBackend lee exports Parquet/CSV
+# con los lectores de Arrow y agrega en pandas, sin JVM ni cluster.
+
+SOURCE_COLS = DIMS + ["count"]
+
+def _local_path(f):
+    # rutas que devuelve Spark -> ruta local para os.stat
+    if f.startswith("dbfs:"):
+        return "/dbfs" + f[len("dbfs:"):]
+    if f.startswith("file:"):
+        return f[len("file:"):]
+    return f
+
+def _stamp_files(h, files):
+    for f in files:
+        h.update(f"|{f}".encode())
+        try:
+            st = os.stat(_local_path(f))
+            h.update(f":{st.st_size}:{st.st_mtime_ns}".encode())
+        except OSError:
+            pass
+
+def _read_csv(path, columns, str_cols=()):
+    # lector CSV de Arrow (como read_csv(engine="pyarrow")), pero con str_cols
+    # tipadas como texto al parsear: un código "0049" no debe leerse como 49
+    import pyarrow as pa
+    from pyarrow import csv
+    opts = csv.ConvertOptions(include_columns=list(columns), strings_can_be_null=True,
+                              column_types={c: pa.string() for c in str_cols})
+    return csv.read_csv(path, convert_options=opts).to_pandas()
+
+class SparkBackend:
+    name = "spark"
+
+    def __init__(self, data, arrow=False):
+        self.data  = data
+        self.arrow = arrow   # toArrow al recoger: solo para agregados pequeños
+
+    def discover_dims(self, max_values=MAX_VALUES):
+        return discover_dims(self.data, max_values=max_values)
+
+    def get_fine(self, keys=()):
+        return get_fine(self.data, keys=keys, arrow=self.arrow)
+
+    def get_cube(self):
+        return get_cube(self.data, arrow=self.arrow)
+
+    def since(self, cutoff):
+        from pyspark.sql import functions as F
+        return SparkBackend(self.data.filter(
+            F.to_date(F.col("date")) >= F.to_date(F.lit(f"{cutoff:%Y-%m-%d}"))), self.arrow)
+
+    def scoped(self, cols, scopes):
+        # semi-join contra la lista de ámbitos (broadcast: son pocas filas);
+        # los valores se comparan como texto ("0049" == 49 no vale, "49" sí)
+        from pyspark.sql import functions as F
+        cols   = list(cols)
+        wanted = self.data.sparkSession.createDataFrame(
+            [tuple(str(v) for v in s) for s in scopes], [f"_scope_{c}" for c in cols])
+        cond   = [self.data[c].cast("string") == wanted[f"_scope_{c}"] for c in cols]
+        return SparkBackend(self.data.join(F.broadcast(wanted), cond, "left_semi"), self.arrow)
+
+    def fingerprint(self, table_version=None, content_hash=False):
+        # Versión de tabla (si se conoce), esquema y ficheros con tamaño/mtime.
+        # content_hash=True añade un hash del contenido (un scan completo),
+        # se usa siempre que el DataFrame no tenga ficheros detrás.
+        h = hashlib.sha256()
+        if table_version is not None:
+            h.update(f"|table:{table_version}".encode())
+        h.update(f"|schema:{self.data.schema.simpleString()}".encode())
+        files = sorted(self.data.inputFiles())
+        _stamp_files(h, files)
+
+        if content_hash or not files:
+            from pyspark.sql import functions as F
+            # suma exacta en decimal(38,0): la suma de hashes de 64 bits en long
+            # desborda enseguida (ARITHMETIC_OVERFLOW con spark.sql.ansi.enabled)
+            h64 = F.xxhash64(*self.data.columns).cast("decimal(38,0)")
+            row = self.data.select(F.sum(h64).alias("h"),
+                                   F.count(F.lit(1)).alias("n")).first()
+            h.update(f"|content:{row['h']}:{row['n']}".encode())
+        return h.hexdigest()
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, source, df=None, keys=()):
+        self.source = source
+        self.keys   = list(keys)   # columnas extra que se leen además de SOURCE_COLS
+        if os.path.isdir(source):
+            self.paths = sorted(glob.glob(os.path.join(source, "**", "*.parquet"), recursive=True) +
+                                glob.glob(os.path.join(source, "**", "*.csv"), recursive=True))
+        else:
+            self.paths = [source]
+        self._df = df
+
+    @property
+    def df(self):
+        if self._df is None:
+            frames = []
+            for p in self.paths:
+                if p.endswith(".parquet"):
+                    frame = pd.read_parquet(p, columns=self.keys + SOURCE_COLS)
+                else:
+                    frame = _read_csv(p, self.keys + SOURCE_COLS, self.keys)
+                for c in self.keys:
+                    frame[c] = frame[c].astype("string")
+                frames.append(frame)
+            self._df = pd.concat(frames, ignore_index=True) if frames else \
+                pd.DataFrame(columns=self.keys + SOURCE_COLS)
+        return self._df
+
+    def discover_dims(self, cols=("BRANCH", "type_col", "source_type2_viz"),
+                      max_values=MAX_VALUES):
+        return dims_from_frame(self.df, cols, max_values)
+
+    def get_fine(self, keys=()):
+        keys = list(keys)
+        pdf = (self.df.groupby(keys + DIMS, dropna=False, sort=False)["count"]
+                      .sum(min_count=1).reset_index())
+        pdf["count"] = pdf["count"].fillna(0).astype("int64")
+        pdf["date"]  = pd.to_datetime(pdf["date"]).dt.normalize()
+        return pdf
+
+    def get_cube(self):
+        return cube_from_fine(self.get_fine())
+
+    def since(self, cutoff):
+        df = self.df
+        return LocalBackend(self.source, df=df[pd.to_datetime(df["date"]) >= cutoff],
+                            keys=self.keys)
+
+    def scoped(self, cols, scopes):
+        # las columnas de ámbito se leen como texto (self.keys); si no venían
+        # en keys se relee la fuente con ellas
+        cols = list(cols)
+        if not set(cols) <= set(self.keys):
+            return LocalBackend(self.source, keys=self.keys + [c for c in cols
+                                                               if c not in self.keys]) \
+                .scoped(cols, scopes)
+        wanted = pd.MultiIndex.from_tuples([tuple(str(v) for v in s) for s in scopes],
+                                           names=cols)
+        df     = self.df
+        keep   = pd.MultiIndex.from_frame(df[cols]).isin(wanted)
+        return LocalBackend(self.source, df=df[keep], keys=self.keys)
+
+    def fingerprint(self, table_version=None, content_hash=False):
+        h = hashlib.sha256()
+        if table_version is not None:
+            h.update(f"|table:{table_version}".encode())
+        _stamp_files(h, self.paths)
+        if content_hash:
+            for p in self.paths:
+                with open(p, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+        return h.hexdigest()
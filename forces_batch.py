@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from forces import (MAX_POINTS, extend_palette, cube_from_fine, build_axes, combo_xy,
+                    make_combo_buttons, build_figure, write_html_dedup, write_plotlyjs,
+                    precompress)
+from forces_backend import LocalBackend
+from forces_trace import Tracer
+
+# ════════════════════════════════════════════════
+# BATCH MULTI-ÁMBITO — un agregado, N informes en paralelo
+# ════════════════════════════════════════════════
+# Labo2_Launcher_v2 añade país y código de subsidiaria. En vez de lanzar
+# GDPR.py una vez por ámbito (cada vez un scan de df_result y un
+# OUTPUT_PATH a mano), aquí se agrega una sola vez con las columnas de
+# ámbito como claves extra del agregado diario y cada ámbito (cube, combos,
+# figura, HTML) se pinta en un pool de procesos a partir de su trozo.
+# manifest.json deja tiempos por etapa y tamaños de cada informe.
+#
+#   from forces_backend import SparkBackend
+#   run_batch(SparkBackend(df_result), [("ES", "0049"), ("PT", "0011")], BATCH_DIR)
+#
+#   python forces_batch.py /dbfs/exports/forces/ --scopes ES:0049 PT:0011 -o informes/
+
+SCOPE_COLS    = ["country", "subsidiary"]
+BATCH_DIR     = "/Workspace/Users/TU_EMAIL@dominio.com/forces_batch/"
+BATCH_WORKERS = 4
+BATCH_MODE    = "offline"   # "offline" (plotly.js local compartido + .gz) | "dedup" (CDN)
+
+def scope_key(scope):
+    # los ámbitos se identifican como texto (mismo criterio que backend.scoped)
+    return tuple(str(v) for v in scope)
+
+def scope_file(scope):
+    return "forces_viz_" + re.sub(r"[^A-Za-z0-9_-]+", "-", "_".join(scope_key(scope))) + ".html"
+
+def aggregate_scopes(backend, scopes, scope_cols=SCOPE_COLS):
+    # un único agregado diario con los ámbitos como claves -> {ámbito: fine}
+    fine  = backend.scoped(scope_cols, scopes).get_fine(keys=scope_cols)
+    parts = {}
+    for key, part in fine.groupby(list(scope_cols), observed=True, sort=False):
+        parts[scope_key(key)] = part.drop(columns=list(scope_cols)).reset_index(drop=True)
+    return fine, parts
+
+def render_scope(args):
+    # ámbito -> HTML; devuelve su entrada del manifest
+    scope, fine, out_dir, palette, mode, plotlyjs, max_points = args
+    tracer = Tracer()
+    entry  = {"scope": list(scope), "file": scope_file(scope), "fine_rows": len(fine)}
+    path   = os.path.join(out_dir, entry["file"])
+
+    with tracer.stage("cube") as st:
+        cube_pdf = cube_from_fine(fine)
+        st.collected(cube_pdf)
+    with tracer.stage("combos") as st:
+        axes  = build_axes(cube_pdf)
+        all_b = ["All"] + sorted(v for v in fine["BRANCH"].dropna().unique() if v)
+        all_t = ["All"] + sorted(v for v in fine["type_col"].dropna().unique() if v)
+        combo_data = {(b, t): combo_xy(cube_pdf, b, t, axes) for b in all_b for t in all_t}
+        st.set(combos=len(combo_data))
+    with tracer.stage("figure") as st:
+        _, y_all = combo_data[("All", "All")]
+        fig = build_figure(axes["x_dates"], y_all, axes["g2_structure"], palette,
+                           make_combo_buttons(combo_data, all_b, all_t),
+                           src_types=axes["src_types"])
+        st.set(traces=len(fig.data))
+    with tracer.stage("export") as st:
+        write_html_dedup(fig, combo_data, axes["x_dates"], path, max_points,
+                         include_plotlyjs=plotlyjs)
+        if mode == "offline":
+            precompress([path])
+        st.set(html_bytes=os.path.getsize(path))
+
+    entry.update({
+        "combos":     len(combo_data),
+        "traces":     len(fig.data),
+        "days":       len(axes["x_dates"]),
+        "html_bytes": os.path.getsize(path),
+        "gz_bytes":   os.path.getsize(path + ".gz") if mode == "offline" else None,
+        "wall_s":     round(sum(r["wall_s"] for r in tracer.records), 4),
+        "stages":     {r["stage"]: r["wall_s"] for r in tracer.records},
+    })
+    return entry
+
+def write_manifest(manifest, out_dir):
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+    return path
+
+def run_batch(backend, scopes, out_dir=BATCH_DIR, scope_cols=SCOPE_COLS,
+              workers=BATCH_WORKERS, mode=BATCH_MODE, max_points=MAX_POINTS):
+    os.makedirs(out_dir, exist_ok=True)
+    tracer = Tracer(spark=backend.data.sparkSession if backend.name == "spark" else None)
+    t0     = time.perf_counter()
+
+    print(f"⏳ Agregando {len(scopes)} ámbitos ({', '.join(scope_cols)}, backend {backend.name})...")
+    with tracer.stage("aggregate") as st:
+        fine, parts = aggregate_scopes(backend, scopes, scope_cols)
+        st.collected(fine)
+    # misma paleta en todos los informes: un subgrupo tiene el mismo color en cada ámbito
+    palette = extend_palette(sorted(v for v in fine["source_type2_viz"].dropna().unique() if v))
+
+    if mode == "offline":
+        plotlyjs = write_plotlyjs(out_dir)
+        precompress([os.path.join(out_dir, plotlyjs)])
+    else:
+        plotlyjs = "cdn"
+
+    missing = [scope_key(s) for s in scopes if scope_key(s) not in parts]
+    for s in missing:
+        print(f"  ⚠️ {' | '.join(s)}: sin filas, no se genera informe")
+    jobs = [(s, parts[s], out_dir, palette, mode, plotlyjs, max_points)
+            for s in dict.fromkeys(scope_key(s) for s in scopes) if s in parts]
+
+    print(f"⏳ Pintando {len(jobs)} informes ({workers} procesos)...")
+    with tracer.stage("render") as st:
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                entries = list(pool.map(render_scope, jobs))
+        else:
+            entries = [render_scope(j) for j in jobs]
+        st.set(reports=len(entries))
+
+    stages   = {r["stage"]: r for r in tracer.records}
+    manifest = {
+        "scope_cols":  list(scope_cols),
+        "backend":     backend.name,
+        "mode":        mode,
+        "workers":     workers,
+        "generated":   time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "aggregate":   {"wall_s": stages["aggregate"]["wall_s"],
+                        "rows":   stages["aggregate"]["rows"],
+                        "bytes":  stages["aggregate"]["bytes"],
+                        "spark_jobs": stages["aggregate"].get("spark_jobs")},
+        "render_s":    stages["render"]["wall_s"],
+        "total_s":     round(time.perf_counter() - t0, 4),
+        "plotlyjs":    plotlyjs if mode == "offline" else None,
+        "missing":     [list(s) for s in missing],
+        "reports":     entries,
+    }
+    path = write_manifest(manifest, out_dir)
+
+    for e in entries:
+        print(f"  {' | '.join(e['scope']):<24} {e['wall_s']:>7.2f}s "
+              f"{e['html_bytes'] / 1024:>8.0f} KB  {e['file']}")
+    print(f"✅ {len(entries)} informes: agregado {manifest['aggregate']['wall_s']:.2f}s + "
+          f"render {manifest['render_s']:.2f}s -> {path}")
+    return manifest
+
+def parse_scope(text):
+    return tuple(text.split(":"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Informes forces VIZ por ámbito desde un único agregado")
+    parser.add_argument("source", help="Export Parquet/CSV (fichero o directorio) con las columnas de ámbito")
+    parser.add_argument("--scopes", nargs="+", type=parse_scope, required=True,
+                        help="ámbitos como valores separados por ':' (p.ej. ES:0049)")
+    parser.add_argument("--scope-cols", nargs="+", default=SCOPE_COLS)
+    parser.add_argument("-o", "--out-dir", default=BATCH_DIR)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--mode", choices=["offline", "dedup"], default=BATCH_MODE)
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS)
+    args = parser.parse_args()
+
+    bad = [s for s in args.scopes if len(s) != len(args.scope_cols)]
+    if bad:
+        parser.error(f"cada ámbito necesita {len(args.scope_cols)} valores: {bad}")
+    run_batch(LocalBackend(args.source, keys=args.scope_cols), args.scopes, args.out_dir,
+              args.scope_cols, args.workers, args.mode, args.max_points)
@@ -0,0 +1,120 @@
+import os
+import json
+import glob
+import hashlib
+
+import pandas as pd
+
+# ════════════════════════════════════════════════
+# CACHÉ DE SNAPSHOTS DEL AGREGADO DIARIO
+# ════════════════════════════════════════════════
+# El agregado (date, BRANCH, type_col, source_type, source_type2_viz, count)
+# se guarda en Parquet local con el nombre = huella de la entrada. Si las
+# tablas diamond/log no han cambiado, la siguiente ejecución lo relee en
+# segundos en vez de volver a pasar por el cluster.
+
+CACHE_DIR     = "/Workspace/Users/TU_EMAIL@dominio.com/forces_cache"
+CACHE_VERSION = 1            # subir si cambia el formato del agregado
+MAX_SNAPSHOTS = 5
+MAX_BYTES     = 2 * 1024**3
+
+def cache_key(backend, table_version=None, content_hash=False):
+    # huella de la entrada (ver backend.fingerprint) + versión del formato
+    raw = f"v{CACHE_VERSION}|{backend.name}|" + backend.fingerprint(table_version, content_hash)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+def snapshot_path(cache_dir, key):
+    return os.path.join(cache_dir, f"agg_{key}.parquet")
+
+def list_snapshots(cache_dir):
+    # más reciente primero (mtime = último uso)
+    paths = glob.glob(os.path.join(cache_dir, "agg_*.parquet"))
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+def evict(cache_dir, max_snapshots=MAX_SNAPSHOTS, max_bytes=MAX_BYTES):
+    kept, used = 0, 0
+    for path in list_snapshots(cache_dir):
+        size = os.path.getsize(path)
+        if kept < max_snapshots and used + size <= max_bytes:
+            kept += 1
+            used += size
+        else:
+            os.remove(path)
+            print(f"  🗑️ Snapshot eliminado: {os.path.basename(path)}")
+
+def invalidate(cache_dir, key=None):
+    # key=None borra toda la caché
+    paths = [snapshot_path(cache_dir, key)] if key else list_snapshots(cache_dir)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"🧹 Caché invalidada ({len(paths)} snapshot(s))")
+
+def load_or_compute(backend, cache_dir=CACHE_DIR, table_version=None,
+                    content_hash=False, max_snapshots=MAX_SNAPSHOTS, max_bytes=MAX_BYTES):
+    key  = cache_key(backend, table_version, content_hash)
+    path = snapshot_path(cache_dir, key)
+    if os.path.exists(path):
+        os.utime(path)
+        print(f"♻️ Agregado desde caché: {os.path.basename(path)}")
+        return pd.read_parquet(path)
+
+    pdf = backend.get_fine()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    pdf.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    print(f"💾 Agregado guardado en caché: {os.path.basename(path)}")
+    evict(cache_dir, max_snapshots, max_bytes)
+    return pdf
+
+# ════════════════════════════════════════════════
+# MODO INCREMENTAL (high-water-mark + lookback)
+# ════════════════════════════════════════════════
+# El log pipeline añade un día cada vez: en vez de reagregar todo el
+# histórico, se guarda el agregado y la última fecha vista (hwm). Cada
+# ejecución solo agrega date >= hwm - lookback_days y sustituye esos días
+# en el agregado guardado, así las correcciones tardías dentro de la
+# ventana también entran. Fuera de la ventana hace falta full_refresh=True.
+
+INCR_DIR      = "/Workspace/Users/TU_EMAIL@dominio.com/forces_incremental"
+LOOKBACK_DAYS = 3
+
+def _save_incremental(incr_dir, pdf, state):
+    os.makedirs(incr_dir, exist_ok=True)
+    data_path  = os.path.join(incr_dir, "agg.parquet")
+    state_path = os.path.join(incr_dir, "state.json")
+    pdf.to_parquet(data_path + ".tmp", index=False)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(state_path + ".tmp", state_path)
+
+def load_incremental(backend, incr_dir=INCR_DIR, lookback_days=LOOKBACK_DAYS,
+                     full_refresh=False):
+    data_path  = os.path.join(incr_dir, "agg.parquet")
+    state_path = os.path.join(incr_dir, "state.json")
+
+    state = {}
+    if not full_refresh and os.path.exists(data_path) and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    if not state.get("hwm"):
+        pdf = backend.get_fine()
+        print(f"💾 Agregado incremental inicializado ({len(pdf)} filas)")
+    else:
+        cutoff = pd.Timestamp(state["hwm"]) - pd.Timedelta(days=lookback_days)
+        stored = pd.read_parquet(data_path)
+        delta  = backend.since(cutoff).get_fine()
+        pdf = pd.concat([stored[stored["date"] < cutoff], delta], ignore_index=True)
+        print(f"➕ Incremental desde {cutoff:%Y-%m-%d}: {len(delta)} filas nuevas/corregidas "
+              f"({len(pdf)} en total)")
+
+    hwm = pdf["date"].max()
+    _save_incremental(incr_dir, pdf, {
+        "hwm":           None if pd.isna(hwm) else hwm.strftime("%Y-%m-%d"),
+        "lookback_days": lookback_days,
+        "rows":          len(pdf),
+    })
+    return pdf
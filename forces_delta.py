@@ -0,0 +1,170 @@
+import os
+import glob
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from forces import DIMS, EXTRA_SRC_TYPES
+from forces_logs import parse_filename
+
+# ════════════════════════════════════════════════
+# DELTA GENERATOR — huellas por registro y merge de arrays ordenados
+# ════════════════════════════════════════════════
+# Labo2_deltaGenerator_v2 compara los ficheros generados con el periodo
+# anterior. En vez de cruzar los dos extractos completos, de cada periodo
+# se guarda solo una huella por registro: hash de 64 bits de la clave,
+# hash del resto de columnas (payload) y el código de su grupo
+# (BRANCH, type_col, source_type2_viz), ordenado por clave en un .npy que
+# se abre con mmap. Nuevos / eliminados / modificados salen de buscar las
+# claves de un array en el otro (searchsorted sobre arrays ordenados).
+#
+# El resultado son filas DIMS + count con source_type "delta new" /
+# "delta removed" / "delta changed" (EXTRA_SRC_TYPES en forces.py): se
+# guardan en deltas.parquet y GDPR.py las suma al cube como series extra.
+#
+#   python forces_delta.py /ruta/snapshots /ruta/ficheros/*.csv --key ID
+
+DELTA_DIR   = "/Workspace/Users/TU_EMAIL@dominio.com/forces_delta"
+KEY_COLS    = ["ID"]
+GROUP_COLS  = ["BRANCH", "type_col", "source_type2_viz"]
+CHUNK_ROWS  = 500_000   # filas por bloque al leer CSV y al comparar huellas
+FP_DTYPE    = np.dtype([("key", "<u8"), ("payload", "<u8"), ("group", "<u4")])
+DELTA_NEW, DELTA_REMOVED, DELTA_CHANGED = EXTRA_SRC_TYPES
+
+def _hash(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype="<u8")
+
+def fingerprint_files(paths, root=None, key_cols=KEY_COLS, chunk_rows=CHUNK_ROWS):
+    # -> (array FP_DTYPE ordenado por key, lista de grupos)
+    groups, parts = {}, []
+    for path in paths:
+        meta = parse_filename(path, root or os.path.dirname(os.path.dirname(path))) or {}
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            for col, default in (("BRANCH", meta.get("branch")), ("type_col", meta.get("type_col"))):
+                if col not in chunk:
+                    chunk[col] = default
+            if "source_type2_viz" not in chunk:
+                chunk["source_type2_viz"] = ""
+            payload = [c for c in chunk.columns if c not in key_cols and c not in GROUP_COLS]
+
+            # la clave incluye branch y type: el mismo ID en dos ficheros son dos registros
+            g_keys = pd.MultiIndex.from_frame(chunk[GROUP_COLS])
+            codes  = np.array([groups.setdefault(k, len(groups)) for k in g_keys.unique()],
+                              dtype="<u4")[g_keys.unique().get_indexer(g_keys)]
+            fp = np.empty(len(chunk), dtype=FP_DTYPE)
+            fp["key"]     = _hash(chunk[key_cols + ["BRANCH", "type_col"]])
+            fp["payload"] = _hash(chunk[payload + ["source_type2_viz"]])
+            fp["group"]   = codes
+            parts.append(fp)
+
+    fp = np.concatenate(parts) if parts else np.empty(0, dtype=FP_DTYPE)
+    # orden por clave; con claves repetidas se queda la última aparición
+    order = np.argsort(fp["key"], kind="stable")
+    fp    = fp[order]
+    last  = np.append(fp["key"][1:] != fp["key"][:-1], True)
+    if not last.all():
+        print(f"  ⚠️ {int((~last).sum())} claves repetidas, se usa la última aparición")
+    return fp[last], [list(k) for k in groups]
+
+def save_snapshot(fp, groups, delta_dir, date):
+    os.makedirs(delta_dir, exist_ok=True)
+    base = os.path.join(delta_dir, f"fp_{date:%Y%m%d}")
+    np.save(base + ".tmp.npy", fp)
+    with open(base + ".json.tmp", "w") as f:
+        json.dump({"groups": groups, "records": len(fp)}, f)
+    os.replace(base + ".tmp.npy", base + ".npy")
+    os.replace(base + ".json.tmp", base + ".json")
+    print(f"💾 Huellas {date:%Y-%m-%d}: {len(fp)} registros "
+          f"({os.path.getsize(base + '.npy') / 1024**2:.1f} MB)")
+
+def list_snapshots(delta_dir):
+    dates = [pd.Timestamp(os.path.basename(p)[3:11])
+             for p in glob.glob(os.path.join(delta_dir, "fp_*.npy"))]
+    return sorted(dates)
+
+def load_snapshot(delta_dir, date):
+    base = os.path.join(delta_dir, f"fp_{date:%Y%m%d}")
+    with open(base + ".json") as f:
+        groups = json.load(f)["groups"]
+    return np.load(base + ".npy", mmap_mode="r"), groups
+
+def diff_fingerprints(prev, cur, chunk_rows=CHUNK_ROWS):
+    # Ambos ordenados por key. Se recorre cur por bloques buscando sus
+    # claves en prev: memoria = un bloque + 1 byte por registro de prev.
+    seen = np.zeros(len(prev), dtype=bool)
+    new, changed = [], []
+    for s in range(0, len(cur), chunk_rows):
+        c     = np.asarray(cur[s:s + chunk_rows])
+        pos   = np.searchsorted(prev["key"], c["key"])
+        pos_c = np.minimum(pos, max(len(prev) - 1, 0))
+        found = (pos < len(prev)) & (np.asarray(prev["key"][pos_c]) == c["key"]) \
+            if len(prev) else np.zeros(len(c), dtype=bool)
+        seen[pos_c[found]] = True
+        new.append(c["group"][~found])
+        diff = np.asarray(prev["payload"][pos_c[found]]) != c["payload"][found]
+        changed.append(c["group"][found][diff])
+    empty = np.empty(0, dtype="<u4")
+    return {DELTA_NEW:     np.concatenate(new) if new else empty,
+            DELTA_REMOVED: np.asarray(prev["group"][~seen]),
+            DELTA_CHANGED: np.concatenate(changed) if changed else empty}
+
+def delta_frame(codes, groups_prev, groups_cur, date):
+    # códigos de grupo por tipo de delta -> filas DIMS + count
+    rows = []
+    for kind, c in codes.items():
+        groups = groups_prev if kind == DELTA_REMOVED else groups_cur
+        counts = np.bincount(c, minlength=len(groups)) if len(c) else np.zeros(len(groups), int)
+        for (branch, type_col, s2), n in zip(groups, counts):
+            if n:
+                rows.append((branch, type_col, date, kind, s2 or None, int(n)))
+    pdf = pd.DataFrame(rows, columns=DIMS + ["count"])
+    pdf["date"]  = pd.to_datetime(pdf["date"])
+    pdf["count"] = pdf["count"].astype("int64")
+    return pdf
+
+def load_deltas(delta_dir=DELTA_DIR):
+    path = os.path.join(delta_dir, "deltas.parquet")
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=DIMS + ["count"])
+    return pd.read_parquet(path)
+
+def run_delta(paths, date, delta_dir=DELTA_DIR, root=None, key_cols=KEY_COLS,
+              chunk_rows=CHUNK_ROWS):
+    date = pd.Timestamp(date)
+    fp, groups = fingerprint_files(paths, root, key_cols, chunk_rows)
+    previous   = [d for d in list_snapshots(delta_dir) if d < date]
+    save_snapshot(fp, groups, delta_dir, date)
+    if not previous:
+        print("  ⚠️ Sin periodo anterior: primera huella guardada, no hay deltas")
+        return pd.DataFrame(columns=DIMS + ["count"])
+
+    prev, groups_prev = load_snapshot(delta_dir, previous[-1])
+    pdf = delta_frame(diff_fingerprints(prev, fp, chunk_rows), groups_prev, groups, date)
+
+    # histórico: se sustituyen los deltas de este día
+    hist = load_deltas(delta_dir)
+    hist = pd.concat([hist[pd.to_datetime(hist["date"]) != date], pdf], ignore_index=True)
+    path = os.path.join(delta_dir, "deltas.parquet")
+    hist.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+    totals = pdf.groupby("source_type")["count"].sum()
+    print(f"✅ Deltas {previous[-1]:%Y-%m-%d} -> {date:%Y-%m-%d}: "
+          + ", ".join(f"{k.split()[-1]}={totals.get(k, 0)}" for k in EXTRA_SRC_TYPES))
+    return pdf
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deltas entre periodos por huellas de registro")
+    parser.add_argument("delta_dir", help="Directorio de huellas y deltas.parquet")
+    parser.add_argument("files", nargs="+", help="CSV del periodo actual")
+    parser.add_argument("--date", help="fecha del periodo (por defecto, la del nombre del fichero)")
+    parser.add_argument("--root", help="raíz de los CSV (type_col = primera carpeta bajo ella)")
+    parser.add_argument("--key", nargs="+", default=KEY_COLS)
+    args = parser.parse_args()
+
+    date = args.date or (parse_filename(args.files[0], args.root or ".") or {}).get("date")
+    if date is None:
+        parser.error("no se puede deducir la fecha del nombre, usa --date")
+    run_delta(args.files, date, args.delta_dir, args.root, args.key)
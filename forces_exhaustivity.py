@@ -0,0 +1,162 @@
+import os
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from forces_logs import BLOCK_SIZE, LOG_WORKERS, parse_filename, count_file
+
+# ════════════════════════════════════════════════
+# CONTROL DE EXHAUSTIVIDAD — índice persistente de conteos por fichero
+# ════════════════════════════════════════════════
+# Labo2_exhaustivity_control_SG relee el CSV actual y el anterior para ver
+# si el nuevo crece más de un 20%. Aquí cada fichero se cuenta una sola vez
+# (filas, bytes y desglose source_type x source_type2_viz, con count_file
+# de forces_logs) y se guarda en un índice JSON; solo se vuelve a leer si
+# cambia su huella (tamaño + mtime). La regla del 20% y sus variantes por
+# branch / type / subgrupo salen del índice en milisegundos.
+#
+#   python forces_exhaustivity.py /ruta/ficheros --index index.json
+#   python forces_exhaustivity.py /ruta/ficheros --by BRANCH type_col source_type2_viz
+#
+# Código de salida 1 si hay que notificar a SG ("report"), 0 si no ("no_report").
+
+INDEX_PATH       = "/Workspace/Users/TU_EMAIL@dominio.com/forces_exhaustivity/index.json"
+INDEX_VERSION    = 1
+GROWTH_THRESHOLD = 0.20
+FILE_KEYS        = ["BRANCH", "type_col"]   # una "familia" de ficheros = branch x type
+
+def load_index(path=INDEX_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    return {"version": INDEX_VERSION, "files": {}}
+
+def save_index(index, path=INDEX_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def update_index(root, index_path=INDEX_PATH, files=None, workers=LOG_WORKERS,
+                 delimiter=",", block_size=BLOCK_SIZE):
+    # files=None recorre root y quita del índice los ficheros que ya no
+    # existen; con files (p.ej. el fichero recién generado) solo se añaden
+    index   = load_index(index_path)
+    entries = index["files"]
+    paths   = files or sorted(glob.glob(os.path.join(root, "**", "*.csv"), recursive=True))
+
+    jobs, kept = [], 0
+    for p in paths:
+        meta = parse_filename(p, root)
+        if meta is None:
+            continue
+        key  = os.path.relpath(p, root)
+        size, mtime = _stamp(p)
+        old  = entries.get(key)
+        if old and old["bytes"] == size and old["mtime_ns"] == mtime:
+            kept += 1
+            continue
+        meta["date"] = meta["date"].isoformat()
+        jobs.append((key, size, mtime, meta, (p, meta, delimiter, block_size)))
+
+    if files is None:
+        present = {os.path.relpath(p, root) for p in paths}
+        for key in [k for k in entries if k not in present]:
+            del entries[key]
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(count_file, [j[-1] for j in jobs])
+            for (key, size, mtime, meta, _), (_, pdf, rows, err) in zip(jobs, results):
+                if err:
+                    print(f"  ⚠️ {key}: {err}")
+                    continue
+                entries[key] = {
+                    "branch":   meta["branch"],
+                    "type_col": meta["type_col"],
+                    "date":     meta["date"],
+                    "bytes":    size,
+                    "mtime_ns": mtime,
+                    "rows":     rows,
+                    "counts":   pdf[["BRANCH", "type_col", "source_type", "source_type2_viz",
+                                     "count"]].astype(object).where(pdf.notna(), None)
+                                             .values.tolist(),
+                }
+
+    save_index(index, index_path)
+    print(f"♻️ Índice: {kept} ficheros sin cambios, {len(jobs)} (re)contados, "
+          f"{len(entries)} en total")
+    return index
+
+def index_frames(index):
+    # (ficheros, desglose): una fila por fichero y una por fichero x subgrupo
+    files, parts = [], []
+    for key, e in index["files"].items():
+        files.append({"file": key, "BRANCH": e["branch"], "type_col": e["type_col"],
+                      "date": e["date"], "rows": e["rows"], "bytes": e["bytes"]})
+        for branch, type_col, src, s2, cnt in e["counts"]:
+            parts.append((key, branch, type_col, e["date"], src, s2, cnt))
+    files = pd.DataFrame(files, columns=["file", "BRANCH", "type_col", "date", "rows", "bytes"])
+    parts = pd.DataFrame(parts, columns=["file", "BRANCH", "type_col", "date",
+                                         "source_type", "source_type2_viz", "count"])
+    files["date"] = pd.to_datetime(files["date"])
+    parts["date"] = pd.to_datetime(parts["date"])
+    return files, parts
+
+def check_growth(index, by=FILE_KEYS, metric="rows", threshold=GROWTH_THRESHOLD):
+    # Último día frente al anterior de cada grupo `by`. metric: "rows" o
+    # "bytes" (por fichero) si by ⊆ FILE_KEYS; con columnas de desglose
+    # (source_type, source_type2_viz) se compara el count.
+    files, parts = index_frames(index)
+    by = list(by)
+    if set(by) <= set(FILE_KEYS):
+        df, col = files, metric
+    else:
+        df, col = parts, "count"
+
+    daily = (df.groupby(by + ["date"], dropna=False)[col].sum()
+               .reset_index().sort_values(by + ["date"]))
+    g = daily.groupby(by, dropna=False, sort=False)
+    daily["prev_date"]  = g["date"].shift()
+    daily["prev_value"] = g[col].shift()
+    last = g.tail(1).rename(columns={col: "value"})
+    last = last[last["prev_value"].notna()].copy()
+    last["growth"] = last["value"] / last["prev_value"].where(last["prev_value"] > 0) - 1
+    last["alert"]  = last["growth"] > threshold
+    return last[by + ["date", "prev_date", "value", "prev_value", "growth", "alert"]] \
+        .reset_index(drop=True)
+
+def report_status(growth):
+    return "report" if growth["alert"].any() else "no_report"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Control de exhaustividad desde el índice de conteos")
+    parser.add_argument("source", help="Directorio con los CSV generados")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--by", nargs="+", default=FILE_KEYS)
+    parser.add_argument("--metric", choices=["rows", "bytes"], default="rows")
+    parser.add_argument("--threshold", type=float, default=GROWTH_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=LOG_WORKERS)
+    args = parser.parse_args()
+
+    index = update_index(args.source, args.index, workers=args.workers)
+    t0 = time.perf_counter()
+    growth = check_growth(index, args.by, args.metric, args.threshold)
+    status = report_status(growth)
+    print(f"📐 Regla >{args.threshold:.0%} por {', '.join(args.by)}: "
+          f"{len(growth)} grupos en {(time.perf_counter() - t0) * 1000:.0f} ms")
+    for r in growth[growth["alert"]].itertuples(index=False):
+        print(f"  ⚠️ {' | '.join(str(getattr(r, c)) for c in args.by)}: "
+              f"{r.prev_value:.0f} -> {r.value:.0f} ({r.growth:+.0%})")
+    print(f"{'⚠️' if status == 'report' else '✅'} {status}")
+    raise SystemExit(1 if status == "report" else 0)
@@ -0,0 +1,187 @@
+import os
+import re
+import glob
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from forces import DIMS, SRC_TYPES
+
+# ════════════════════════════════════════════════
+# LOG GENERATOR — conteos de df_result desde los CSV generados
+# ════════════════════════════════════════════════
+# Equivalente local de Labo2_logGenerator_v2: recorre los CSV corporate /
+# private / supplier de un directorio (copia local de las rutas NAS), se
+# queda con los válidos, etiqueta el tipo y cuenta filas por fecha. Cada
+# CSV se lee en streaming (memory map + lector de Arrow, bloques de BLOCK_SIZE,
+# solo las columnas necesarias) dentro de un pool de procesos: la memoria
+# no depende del tamaño de los ficheros. La salida tiene las columnas de
+# df_result (DIMS + count) y se puede pasar tal cual a LocalBackend.
+#
+#   python forces_logs.py /ruta/ficheros -o df_result.parquet [--workers 8]
+#   python forces_logs.py /tmp/muestra --make-sample 40
+#
+# Convención de rutas: <raíz>/<type_col>/<BRANCH>_<fecha>[_<n>].csv
+# BRANCH y type_col se leen del CSV si traen esas columnas; si no, del
+# nombre del fichero y de la carpeta. La fecha sale siempre del nombre.
+
+BLOCK_SIZE  = 16 * 1024**2   # bytes por bloque leído (memoria por worker ~ constante)
+LOG_WORKERS = os.cpu_count() or 4
+KEY_COLS    = ["BRANCH", "type_col", "source_type", "source_type2_viz"]
+BRANCH_RE   = re.compile(r"^(?P<branch>[A-Z]{2,})_")
+
+# formatos de fecha en el nombre, los largos y específicos primero
+DATE_FORMATS = [
+    (r"(?<!\d)\d{14}(?!\d)",                "%Y%m%d%H%M%S"),
+    (r"(?<!\d)\d{8}(?!\d)",                 "%Y%m%d"),
+    (r"(?<!\d)\d{4}-\d{2}-\d{2}(?!\d)",     "%Y-%m-%d"),
+    (r"(?<!\d)\d{2}-\d{2}-\d{4}(?!\d)",     "%d-%m-%Y"),
+    (r"(?<!\d)\d{2}_\d{2}_\d{4}(?!\d)",     "%d_%m_%Y"),
+    (r"(?<!\d)\d{4}\.\d{2}\.\d{2}(?!\d)",   "%Y.%m.%d"),
+    (r"(?<!\d)\d{2}[A-Za-z]{3}\d{2}(?!\d)", "%d%b%y"),
+    (r"(?<!\d)\d{6}(?!\d)",                 "%d%m%y"),
+]
+
+def extract_date(filename):
+    for pattern, fmt in DATE_FORMATS:
+        match = re.search(pattern, filename)
+        if match:
+            try:
+                return datetime.datetime.strptime(match.group(0), fmt).date()
+            except ValueError:
+                continue
+    return None
+
+def parse_filename(path, root):
+    # BRANCH + fecha del nombre, type_col = primera carpeta bajo la raíz
+    name  = os.path.basename(path)
+    match = BRANCH_RE.match(name)
+    date  = extract_date(name[match.end():]) if match else None
+    if date is None:
+        return None
+    rel = os.path.relpath(path, root).split(os.sep)
+    return {"branch":   match.group("branch"),
+            "type_col": rel[0] if len(rel) > 1 else None,
+            "date":     date}
+
+def count_file(args):
+    # conteo de un CSV en streaming: (path, pdf con DIMS + count, filas, error)
+    path, meta, delimiter, block_size = args
+    import pyarrow as pa
+    from pyarrow import csv
+
+    try:
+        # memory_map: el fichero no pasa por el pool de Arrow (con una ruta
+        # el lector llega a reservar casi todo el fichero por read-ahead)
+        reader = csv.open_csv(
+            pa.memory_map(path),
+            read_options=csv.ReadOptions(block_size=block_size),
+            parse_options=csv.ParseOptions(delimiter=delimiter),
+            convert_options=csv.ConvertOptions(
+                include_columns=KEY_COLS, include_missing_columns=True,
+                column_types={c: pa.string() for c in KEY_COLS}),
+        )
+        parts, rows = [], 0
+        for batch in reader:
+            t = pa.Table.from_batches([batch])
+            rows += t.num_rows
+            parts.append(t.group_by(KEY_COLS).aggregate([([], "count_all")]))
+    except (pa.ArrowInvalid, OSError) as e:
+        return path, None, 0, str(e).splitlines()[0]
+
+    if not parts:
+        return path, pd.DataFrame(columns=DIMS + ["count"]), 0, None
+
+    pdf = (pa.concat_tables(parts).group_by(KEY_COLS)
+             .aggregate([("count_all", "sum")]).to_pandas()
+             .rename(columns={"count_all_sum": "count"}))
+    pdf["BRANCH"]   = pdf["BRANCH"].fillna(meta["branch"])
+    pdf["type_col"] = pdf["type_col"].fillna(meta["type_col"])
+    pdf["date"]     = pd.Timestamp(meta["date"])
+    return path, pdf[DIMS + ["count"]], rows, None
+
+def count_logs(root, files=None, workers=LOG_WORKERS, delimiter=",", block_size=BLOCK_SIZE):
+    # files: lista de rutas ya filtrada (p.ej. las OK en LABO2_FILES_T);
+    # por defecto todos los .csv bajo root
+    paths = files or sorted(glob.glob(os.path.join(root, "**", "*.csv"), recursive=True))
+    jobs, skipped = [], []
+    for p in paths:
+        meta = parse_filename(p, root)
+        if meta is None:
+            skipped.append(p)
+        else:
+            jobs.append((p, meta, delimiter, block_size))
+    if skipped:
+        print(f"  ⚠️ {len(skipped)} ficheros sin BRANCH/fecha en el nombre, se omiten")
+
+    print(f"⏳ Contando {len(jobs)} ficheros con {workers} procesos...")
+    frames, rows, failed = [], 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, pdf, n, err in pool.map(count_file, jobs):
+            if err:
+                failed += 1
+                print(f"  ⚠️ {os.path.basename(path)}: {err}")
+                continue
+            frames.append(pdf)
+            rows += n
+
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=DIMS + ["count"])
+    out = (pd.concat(frames, ignore_index=True)
+             .groupby(DIMS, dropna=False, sort=False)["count"].sum().reset_index())
+    out["count"] = out["count"].astype("int64")
+    out["date"]  = pd.to_datetime(out["date"]).dt.normalize()
+    print(f"✅ {len(jobs) - failed} ficheros, {rows} filas -> {len(out)} conteos")
+    return out
+
+# ════════════════════════════════════════════════
+# MUESTRA LOCAL — árbol de CSV con la forma de las rutas NAS
+# ════════════════════════════════════════════════
+SAMPLE_BRANCHES = ["AR", "BR", "CL", "MX", "ES", "FR", "DE", "IT"]
+SAMPLE_TYPES    = {"corporate": ["CUS_CORPORATE", "Legal Representative", "Shareholder", "Guarantor"],
+                   "private":   ["CUS_PRIVATE", "Customer", "Guarantor"],
+                   "supplier":  ["Supplier", "Parent", "Remarketing Dealer"]}
+
+def write_sample(out_dir, n_files=24, rows_per_file=50_000, start="2025-01-01", seed=42):
+    rng   = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    for i in range(n_files):
+        type_col = list(SAMPLE_TYPES)[i % len(SAMPLE_TYPES)]
+        branch   = SAMPLE_BRANCHES[rng.integers(len(SAMPLE_BRANCHES))]
+        day      = start + pd.Timedelta(days=int(i // len(SAMPLE_TYPES)))
+        roles    = SAMPLE_TYPES[type_col]
+        n        = int(rng.integers(rows_per_file // 2, rows_per_file))
+        os.makedirs(os.path.join(out_dir, type_col), exist_ok=True)
+        name = f"{branch}_{day:%Y%m%d}_{rng.integers(1000, 99999)}.csv"
+        pd.DataFrame({
+            "ID":               rng.integers(1, 10**9, n),
+            "source_type":      np.array(SRC_TYPES)[rng.integers(0, len(SRC_TYPES), n)],
+            "source_type2_viz": np.array(roles)[rng.integers(0, len(roles), n)],
+        }).to_csv(os.path.join(out_dir, type_col, name), index=False)
+    # un fichero que no sigue la convención, para comprobar el filtro
+    with open(os.path.join(out_dir, "README.csv"), "w") as f:
+        f.write("nota\nfichero sin BRANCH ni fecha\n")
+    print(f"✅ Muestra: {n_files} ficheros en {out_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conteos df_result desde los CSV del log generator")
+    parser.add_argument("source", help="Directorio con los CSV (copia local de las rutas NAS)")
+    parser.add_argument("-o", "--output", default="df_result.parquet")
+    parser.add_argument("--workers", type=int, default=LOG_WORKERS)
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--block-mb", type=int, default=BLOCK_SIZE // 1024**2)
+    parser.add_argument("--make-sample", type=int, metavar="N",
+                        help="escribe N ficheros de muestra en source y termina")
+    args = parser.parse_args()
+
+    if args.make_sample:
+        write_sample(args.source, args.make_sample)
+    else:
+        pdf = count_logs(args.source, workers=args.workers, delimiter=args.delimiter,
+                         block_size=args.block_mb * 1024**2)
+        pdf.to_parquet(args.output, index=False)
+        print(f"💾 {args.output}")
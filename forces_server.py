@@ -0,0 +1,153 @@
+import os
+import argparse
+import asyncio
+import json
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from forces import (MAX_VALUES, extend_palette, cube_from_fine, build_axes, combo_xy,
+                    combo_title, build_figure)
+from forces_backend import LocalBackend
+from forces_cache import load_or_compute
+
+# ════════════════════════════════════════════════
+# MODO INTERACTIVO — slices bajo demanda
+# ════════════════════════════════════════════════
+# En vez de precalcular combo_data para todos los (branch, type), se carga
+# el cube y cada combo se calcula solo cuando alguien la selecciona, con un
+# LRU de las últimas pedidas. Arranque y primer gráfico solo dependen de
+# All x All. El origen puede ser:
+#   - exports Parquet/CSV de df_result (LocalBackend): cube_from_fine sobre
+#     el agregado diario, reutilizando la caché de snapshots con --cache-dir
+#   - el cube que deja GDPR.py (CUBE_PATH)
+# La paleta sale de los source_type2_viz descubiertos, como en GDPR.py.
+#
+#   python forces_server.py /dbfs/exports/forces/ --cache-dir /ruta/forces_cache
+#   python forces_server.py /ruta/forces_cube.parquet --port 8050
+
+SLICE_CACHE = 64
+
+PAGE_JS = """
+var gd = document.getElementById('{plot_id}');
+var D  = %s;
+var bar = document.createElement('div');
+bar.style.cssText = 'font-family:sans-serif;font-size:13px;margin:8px 60px;';
+function sel(name, vals) {
+    var s = document.createElement('select');
+    vals.forEach(function (v) { var o = document.createElement('option'); o.text = v; s.add(o); });
+    s.onchange = load;
+    bar.appendChild(document.createTextNode(' ' + name + ': '));
+    bar.appendChild(s);
+    return s;
+}
+var sb = sel('Branch', D.branches), st = sel('Type', D.types);
+gd.parentNode.insertBefore(bar, gd);
+function load() {
+    var q = '?branch=' + encodeURIComponent(sb.value) + '&type=' + encodeURIComponent(st.value);
+    fetch('/slice' + q).then(function (r) { return r.json(); }).then(function (s) {
+        Plotly.update(gd, {x: s.y.map(function () { return s.x; }), y: s.y},
+                      {'title.text': s.title});
+    });
+}
+"""
+
+def _is_cube(path):
+    if not (os.path.isfile(path) and path.endswith(".parquet")):
+        return False
+    import pyarrow.parquet as pq
+    return {"cnt", "s2_rollup"} <= set(pq.read_schema(path).names)
+
+def load_cube(source, cache_dir=None):
+    # -> (cube_pdf, axes, branches, types, palette)
+    if _is_cube(source):
+        cube_pdf = pd.read_parquet(source)
+    else:
+        backend  = LocalBackend(source)
+        fine     = load_or_compute(backend, cache_dir) if cache_dir else backend.get_fine()
+        cube_pdf = cube_from_fine(fine)
+    # mismos valores que discover_dims en GDPR.py (ordenados, sin vacíos,
+    # tope MAX_VALUES), sin releer los exports si el agregado viene de caché
+    all_s2   = sorted(v for v in cube_pdf["source_type2_viz"].dropna().unique() if v)[:MAX_VALUES]
+    axes     = build_axes(cube_pdf)
+    branches = ["All"] + sorted(b for b in cube_pdf["BRANCH"].dropna().unique() if b != "All")
+    types    = ["All"] + sorted(t for t in cube_pdf["type_col"].dropna().unique() if t != "All")
+    return cube_pdf, axes, branches, types, extend_palette(all_s2)
+
+def make_app(cube_pdf, axes, branches, types, palette, cache_size=SLICE_CACHE):
+
+    @lru_cache(maxsize=cache_size)
+    def get_slice(branch, type_col):
+        # JSON ya serializado: un hit del LRU no vuelve a tocar pandas
+        _, new_y = combo_xy(cube_pdf, branch, type_col, axes)
+        return json.dumps({
+            "x":     axes["x_dates"],
+            "y":     [y.tolist() for y in new_y],
+            "title": combo_title(branch, type_col),
+        }, separators=(",", ":")).encode()
+
+    def index_page():
+        _, y_all = combo_xy(cube_pdf, "All", "All", axes)
+        fig      = build_figure(axes["x_dates"], y_all, axes["g2_structure"], palette,
+                                src_types=axes["src_types"])
+        post     = PAGE_JS % json.dumps({"branches": branches, "types": types})
+        return fig.to_html(include_plotlyjs="cdn", full_html=True,
+                           config={"scrollZoom": True}, post_script=post).encode()
+
+    page = index_page()
+
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            method, target, _ = request.decode("latin-1").split(" ", 2)
+            url = urlsplit(target)
+            if method != "GET":
+                status, ctype, body = "405 Method Not Allowed", "text/plain", b""
+            elif url.path == "/":
+                status, ctype, body = "200 OK", "text/html; charset=utf-8", page
+            elif url.path == "/slice":
+                q        = parse_qs(url.query)
+                branch   = q.get("branch", ["All"])[0]
+                type_col = q.get("type",   ["All"])[0]
+                if branch not in branches or type_col not in types:
+                    status, ctype, body = "404 Not Found", "text/plain", b"unknown combo"
+                else:
+                    loop = asyncio.get_running_loop()
+                    body = await loop.run_in_executor(None, get_slice, branch, type_col)
+                    status, ctype = "200 OK", "application/json"
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", b""
+        except ValueError:
+            status, ctype, body = "400 Bad Request", "text/plain", b""
+
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                      f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode())
+        writer.write(body)
+        await writer.drain()
+        writer.close()
+
+    return handle
+
+async def serve(source, host="127.0.0.1", port=8050, cache_size=SLICE_CACHE, cache_dir=None):
+    cube_pdf, axes, branches, types, palette = load_cube(source, cache_dir)
+    handle = make_app(cube_pdf, axes, branches, types, palette, cache_size)
+    server = await asyncio.start_server(handle, host, port)
+    print(f"✅ Forces VIZ en http://{host}:{port}  "
+          f"({len(branches)} branches x {len(types)} types bajo demanda)")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forces VIZ interactivo (slices bajo demanda)")
+    parser.add_argument("source", help="Exports Parquet/CSV de df_result (fichero o directorio) "
+                                       "o el cube que escribe GDPR.py (CUBE_PATH)")
+    parser.add_argument("--cache-dir", help="caché de snapshots del agregado (forces_cache)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--cache", type=int, default=SLICE_CACHE,
+                        help="slices recientes a mantener en memoria (LRU)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.source, args.host, args.port, args.cache, args.cache_dir))
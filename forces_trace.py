@@ -0,0 +1,133 @@
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# ════════════════════════════════════════════════
+# INSTRUMENTACIÓN POR ETAPAS
+# ════════════════════════════════════════════════
+# tracer.stage("nombre") mide cada etapa del pipeline: tiempo, filas y bytes
+# que llegan al driver (st.collected(pdf)) y, con Spark, los job/stage IDs
+# que lanza (setJobGroup + statusTracker, sin listener en la JVM). Al final
+# tracer.summary() imprime la tabla y tracer.dump(path) deja la traza JSON.
+# Con enabled=False todo es no-op.
+
+class _NullStage:
+    def collected(self, pdf=None, rows=None, nbytes=None):
+        pass
+
+    def set(self, **kwargs):
+        pass
+
+class _Stage:
+    def __init__(self, name):
+        self.rec = {"stage": name, "rows": 0, "bytes": 0}
+
+    def collected(self, pdf=None, rows=None, nbytes=None):
+        # filas/bytes traídos al driver (DataFrame pandas o cifras a mano)
+        if pdf is not None:
+            rows   = len(pdf)
+            nbytes = int(pdf.memory_usage(deep=True).sum())
+        self.rec["rows"]  += rows or 0
+        self.rec["bytes"] += nbytes or 0
+
+    def set(self, **kwargs):
+        self.rec.update(kwargs)
+
+class Tracer:
+    def __init__(self, enabled=True, spark=None):
+        self.enabled = enabled
+        self.spark   = spark
+        self.records = []
+        self.sc      = None
+        self.tags    = False
+        if enabled and spark is not None:
+            try:
+                self.sc = spark.sparkContext
+            except Exception:
+                # Spark Connect (shared-access / serverless) no tiene
+                # SparkContext: los jobs solo se etiquetan con addTag y la
+                # traza se queda en tiempos y filas
+                self.tags = hasattr(spark, "addTag")
+                print("  ⚠️ Tracer: sin SparkContext (Spark Connect), solo tiempos y filas")
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield _NullStage()
+            return
+
+        st    = _Stage(name)
+        sc    = self.sc
+        group = f"forces:{name}:{len(self.records)}"
+        if sc is not None:
+            try:
+                sc.setJobGroup(group, name)
+            except Exception:
+                # p.ej. Py4JSecurityException en clusters con acceso compartido
+                sc = self.sc = None
+        elif self.tags:
+            self.spark.addTag(group)
+            st.rec["spark_tag"] = group
+        t0 = time.perf_counter()
+        st.rec["start"] = time.time()
+        try:
+            yield st
+        finally:
+            st.rec["wall_s"] = round(time.perf_counter() - t0, 4)
+            if sc is not None:
+                try:
+                    st.rec.update(self._spark_jobs(sc, group))
+                    sc.setLocalProperty("spark.jobGroup.id", None)
+                except Exception:
+                    pass
+            elif self.tags:
+                self.spark.removeTag(group)
+            self.records.append(st.rec)
+
+    @staticmethod
+    def _spark_jobs(sc, group):
+        tracker = sc.statusTracker()
+        jobs    = sorted(tracker.getJobIdsForGroup(group))
+        stages  = []
+        for j in jobs:
+            info = tracker.getJobInfo(j)
+            if info is not None:
+                stages.extend(info.stageIds)
+        tasks = 0
+        for s in stages:
+            info = tracker.getStageInfo(s)
+            if info is not None:
+                tasks += info.numTasks
+        # más de un stage por job = hubo shuffle
+        return {"spark_jobs": jobs, "spark_stages": sorted(stages),
+                "spark_tasks": tasks, "shuffles": max(len(stages) - len(jobs), 0)}
+
+    def wrap(self, name=None):
+        # decorador: @tracer.wrap("figure")
+        def deco(fn):
+            @wraps(fn)
+            def inner(*args, **kwargs):
+                with self.stage(name or fn.__name__):
+                    return fn(*args, **kwargs)
+            return inner
+        return deco
+
+    def durations(self):
+        return {r["stage"]: r["wall_s"] for r in self.records}
+
+    def summary(self):
+        if not self.enabled:
+            return
+        print(f"{'stage':<12}{'wall_s':>9}{'rows':>11}{'MB':>9}{'jobs':>6}{'stages':>8}")
+        for r in self.records:
+            print(f"{r['stage']:<12}{r['wall_s']:>9.2f}{r['rows']:>11}"
+                  f"{r['bytes'] / 1024**2:>9.1f}{len(r.get('spark_jobs', [])):>6}"
+                  f"{len(r.get('spark_stages', [])):>8}")
+        print(f"{'total':<12}{sum(r['wall_s'] for r in self.records):>9.2f}")
+
+    def dump(self, path):
+        if not self.enabled:
+            return
+        with open(path, "w") as f:
+            json.dump({"stages": self.records}, f, indent=2)
@@ -0,0 +1,243 @@
+import os
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from plotly.colors import qualitative
+
+from forces import DECODE_JS
+from forces_anomaly import analyze
+
+# ════════════════════════════════════════════════
+# VISTAS DECLARATIVAS — un dataset largo, un dashboard
+# ════════════════════════════════════════════════
+# Cada vista de graficos.py (líneas, barras agrupadas/apiladas, Δ, mapa de
+# calor, lado a lado, áreas apiladas) es un dict en una lista. Las vistas se
+# construyen como specs sin datos: cada traza guarda solo una referencia
+# ("value" | "delta", categoría) a la tabla común. El dashboard lleva esa
+# tabla una sola vez (typed arrays en base64), la plantilla de layout una
+# sola vez y un <div> por vista: añadir una vista cuesta su layout, no otra
+# copia de los datos. view_figures rellena las mismas specs en Python para
+# mostrarlas con fig.show().
+#
+#   views = [dict(id="fig1", kind="line", title="...", rangeslider=True), ...]
+#   figs  = view_figures(to_long(df, cats), views, colors=colors)
+#   write_dashboard(to_long(df, cats), views, "dashboard.html", colors=colors)
+#
+# kind: line | bar | stack | delta | heatmap | area
+# panels=[[cat, ...], [cat, ...]] -> subplots lado a lado (shared_yaxes)
+
+VIEW_WORKERS = 1   # hilos para construir specs (cada una tarda < 1 ms)
+
+GRAFICOS_VIEWS = [
+    dict(id="fig1", kind="line", title="Evolución diaria por categoría",
+         yaxis_title="Valor", rangeslider=True),
+    dict(id="fig2", kind="bar", title="Totales diarios por categoría",
+         yaxis_title="Valor", rangeslider=True),
+    dict(id="fig3", kind="stack", title="Participación por categoría (apilado)",
+         yaxis_title="Valor"),
+    dict(id="fig4", kind="delta", title="Variación diaria (Δ vs día anterior)",
+         yaxis_title="Δ"),
+    dict(id="fig5", kind="heatmap", title="Mapa de calor – variaciones diarias"),
+    dict(id="fig_line", kind="line", title="Evolución diaria – Comparación lado a lado",
+         panels=[["Corporate", "Private"], ["Datacap", "Third parties"]]),
+    dict(id="fig_bar", kind="bar", title="Totales diarios – Barras agrupadas lado a lado",
+         panels=[["Corporate", "Private"], ["Datacap", "Third parties"]]),
+    dict(id="fig_delta", kind="delta", title="Variación diaria (Δ) – lado a lado",
+         panels=[["Corporate", "Private"], ["Datacap", "Third parties"]]),
+    dict(id="fig_area", kind="area",
+         title="Participación relativa – Áreas apiladas lado a lado",
+         panels=[["Corporate", "Private"], ["Datacap", "Third parties"]]),
+]
+
+def to_long(df, cats, date_col="date"):
+    # formato ancho de graficos.py -> (date, category, value)
+    return df.melt(id_vars=date_col, value_vars=cats,
+                   var_name="category", value_name="value") \
+             .rename(columns={date_col: "date"})
+
+def table_arrays(long):
+    # matriz (categorías x fechas) + Δ, una fila por categoría
+    wide  = long.pivot_table(index="category", columns="date", values="value",
+                             aggfunc="sum", sort=False)
+    cats  = list(wide.index)
+    mat   = wide.to_numpy(dtype="float64")
+    delta = analyze(mat, dtype="float64")["diff"]
+    return {
+        "x":     [d.strftime("%Y-%m-%d") for d in pd.to_datetime(wide.columns)],
+        "cats":  cats,
+        "value": {c: mat[i]   for i, c in enumerate(cats)},
+        "delta": {c: delta[i] for i, c in enumerate(cats)},
+    }
+
+def build_table(long):
+    # table_arrays con cada fila como typed array en base64
+    arrays = table_arrays(long)
+
+    def enc(row):
+        return base64.b64encode(np.ascontiguousarray(row, dtype="<f8").tobytes()).decode("ascii")
+
+    table = {
+        "dtype": "f8",
+        "x":     arrays["x"],
+        "cats":  arrays["cats"],
+        "value": {c: enc(v) for c, v in arrays["value"].items()},
+        "delta": {c: enc(v) for c, v in arrays["delta"].items()},
+    }
+    return table
+
+def _trace(kind, cat, color, panel):
+    if kind == "line":
+        return go.Scatter(name=cat, mode="lines+markers", line=dict(width=3, color=color))
+    if kind in ("bar", "stack"):
+        return go.Bar(name=cat, marker_color=color)
+    if kind == "delta":
+        return go.Bar(name=f"Δ {cat}", marker_color=color)
+    if kind == "area":
+        return go.Scatter(name=cat, stackgroup=f"g{panel}", line=dict(color=color))
+    raise ValueError(f"kind desconocido: {kind}")
+
+def build_spec(args):
+    # vista -> {id, data (sin x/y), layout (sin template), refs, template}
+    view, cats, colors = args
+    kind   = view["kind"]
+    panels = view.get("panels") or [cats]
+    refs   = []
+
+    if kind == "heatmap":
+        fig = go.Figure(go.Heatmap(colorscale="RdYlGn",
+                                   colorbar=dict(title=dict(text="Δ diario"))))
+        fig.update_layout(xaxis_title="Fecha", yaxis_title="Categoría")
+        refs.append({"heatmap": "delta", "cats": cats})
+    else:
+        if len(panels) > 1:
+            fig = make_subplots(rows=1, cols=len(panels), shared_yaxes=True,
+                                subplot_titles=[(("Δ " if kind == "delta" else "")
+                                                 + " vs ".join(p)) for p in panels])
+            fig.update_layout(height=500, width=1200)
+        else:
+            fig = go.Figure()
+            fig.update_layout(xaxis_title="Fecha", yaxis_title=view.get("yaxis_title"),
+                              xaxis=dict(type="date"))
+        for i, panel in enumerate(panels):
+            for cat in panel:
+                tr = _trace(kind, cat, colors.get(cat), i)
+                if len(panels) > 1:
+                    fig.add_trace(tr, row=1, col=i + 1)
+                else:
+                    fig.add_trace(tr)
+                refs.append({"y": "delta" if kind == "delta" else "value", "cat": cat})
+
+        if kind in ("bar", "delta"):
+            fig.update_layout(barmode="group")
+        elif kind == "stack":
+            fig.update_layout(barmode="stack")
+        if kind in ("line", "area"):
+            fig.update_layout(hovermode="x unified")
+        if kind == "delta":
+            fig.add_hline(y=0, line_width=1, line_color="black")
+        if view.get("rangeslider"):
+            fig.update_layout(xaxis=dict(rangeslider=dict(visible=True)))
+
+    fig.update_layout(title=view["title"], template="plotly_white")
+    spec = json.loads(fig.to_json())
+    template = spec["layout"].pop("template", None)
+    return {"id": view["id"], "data": spec["data"], "layout": spec["layout"],
+            "refs": refs, "template": "plotly_white" if template else None}, template
+
+def build_specs(views, cats, colors=None, workers=VIEW_WORKERS):
+    if colors is None:
+        colors = dict(zip(cats, qualitative.Plotly * (len(cats) // len(qualitative.Plotly) + 1)))
+    jobs = [(v, cats, colors) for v in views]
+    if workers and workers > 1:
+        # hilos, no procesos: con spawn/forkserver los procesos reimportan el
+        # script que llama (graficos.py) y el arranque cuesta más que las specs
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build_spec, jobs))
+    else:
+        results = [build_spec(j) for j in jobs]
+    templates = {}
+    for spec, template in results:
+        if template is not None:
+            templates.setdefault(spec["template"], template)
+    return [spec for spec, _ in results], templates
+
+def view_figures(long, views, colors=None, workers=VIEW_WORKERS):
+    # specs + datos -> {id: go.Figure}, lo mismo que hace DASHBOARD_JS al cargar
+    arrays = table_arrays(long)
+    specs, templates = build_specs(views, arrays["cats"], colors, workers)
+    figs = {}
+    for spec in specs:
+        data = []
+        for tr, r in zip(spec["data"], spec["refs"]):
+            tr = dict(tr, x=arrays["x"])
+            if "heatmap" in r:
+                tr.update(y=r["cats"], z=[arrays[r["heatmap"]][c] for c in r["cats"]])
+            else:
+                tr.update(y=arrays[r["y"]][r["cat"]])
+            data.append(tr)
+        layout = dict(spec["layout"])
+        if spec["template"]:
+            layout["template"] = templates[spec["template"]]
+        figs[spec["id"]] = go.Figure(data=data, layout=layout)
+    return figs
+
+DASHBOARD_JS = DECODE_JS + """
+var D = %s;
+var cache = {};
+function serie(kind, cat) {
+    var k = kind + ':' + cat;
+    if (!(k in cache)) cache[k] = decode(D.table[kind][cat], D.table.dtype);
+    return cache[k];
+}
+D.views.forEach(function (v) {
+    var data = v.data.map(function (tr, i) {
+        var r = v.refs[i];
+        if (r.heatmap) {
+            tr.x = D.table.x;
+            tr.y = r.cats;
+            tr.z = r.cats.map(function (c) { return Array.from(serie(r.heatmap, c)); });
+        } else {
+            tr.x = D.table.x;
+            tr.y = serie(r.y, r.cat);
+        }
+        return tr;
+    });
+    if (v.template) v.layout.template = D.templates[v.template];
+    Plotly.newPlot(v.id, data, v.layout, {responsive: true});
+});
+"""
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>%s</title>
+<script src="%s"></script></head>
+<body>
+%s
+<script>%s</script>
+</body>
+</html>
+"""
+
+def write_dashboard(long, views, path, colors=None, title="Forces VIZ – vistas",
+                    plotlyjs=None, workers=VIEW_WORKERS):
+    # plotlyjs: URL o ruta relativa de plotly.min.js (None -> CDN de la
+    # versión instalada; con forces.write_plotlyjs se usa la copia local)
+    if plotlyjs is None:
+        from plotly.offline import get_plotlyjs_version
+        plotlyjs = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+    table = build_table(long)
+    specs, templates = build_specs(views, table["cats"], colors, workers)
+    divs  = "\n".join(f'<div id="{s["id"]}"></div>' for s in specs)
+    data  = json.dumps({"table": table, "views": specs, "templates": templates},
+                       separators=(",", ":"))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(DASHBOARD_HTML % (title, plotlyjs, divs, DASHBOARD_JS % data))
+    print(f"✅ Dashboard: {len(specs)} vistas, {len(table['cats'])} series x "
+          f"{len(table['x'])} fechas ({os.path.getsize(path) / 1024:.0f} KB) -> {path}")
+    return path